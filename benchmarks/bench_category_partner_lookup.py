@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: búsqueda de datos geográficos de top clientes en get_category_analysis.
+
+Compara la búsqueda lineal anterior (`next(p for p in partners if p['id'] == partner_id)`)
+con el índice por id que usa ahora el endpoint, sobre una categoría sintética.
+
+Uso:
+    python benchmarks/bench_category_partner_lookup.py [--partners 50000] [--sample 500]
+
+La búsqueda lineal completa sobre 50k clientes tarda minutos, así que se mide sobre
+`--sample` clientes y se extrapola al total.
+"""
+import argparse
+import random
+import time
+
+
+def make_partners(n, seed=1):
+    rnd = random.Random(seed)
+    partners = [
+        {
+            'id': i,
+            'name': f'Cliente {i}',
+            'city': f'Ciudad {rnd.randint(1, 500)}',
+            'state_id': [rnd.randint(1, 52), f'Provincia {rnd.randint(1, 52)}'],
+            'country_id': [1, 'España'],
+        }
+        for i in range(1, n + 1)
+    ]
+    rnd.shuffle(partners)
+    return partners
+
+
+def geo(partner_info):
+    return (
+        partner_info.get('city', 'N/A') if partner_info else 'N/A',
+        partner_info['state_id'][1] if partner_info and partner_info.get('state_id') else 'N/A',
+    )
+
+
+def linear_lookup(partners, customer_ids):
+    return [geo(next((p for p in partners if p['id'] == pid), None)) for pid in customer_ids]
+
+
+def indexed_lookup(partners, customer_ids):
+    partners_by_id = {p['id']: p for p in partners}
+    return [geo(partners_by_id.get(pid)) for pid in customer_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partners', type=int, default=50000, help='clientes en la categoría')
+    parser.add_argument('--sample', type=int, default=500, help='clientes medidos con la búsqueda lineal')
+    args = parser.parse_args()
+
+    partners = make_partners(args.partners)
+    customer_ids = [p['id'] for p in partners]
+    sample = random.Random(2).sample(customer_ids, min(args.sample, len(customer_ids)))
+
+    start = time.perf_counter()
+    linear = linear_lookup(partners, sample)
+    linear_sample = time.perf_counter() - start
+    linear_total = linear_sample / len(sample) * len(customer_ids)
+
+    start = time.perf_counter()
+    indexed = indexed_lookup(partners, customer_ids)
+    indexed_total = time.perf_counter() - start
+
+    assert linear == indexed_lookup(partners, sample)
+    assert len(indexed) == len(customer_ids)
+
+    print(f"Categoría sintética: {len(partners)} clientes activos")
+    print(f"  búsqueda lineal: {linear_sample / len(sample) * 1e6:10.1f} µs/cliente "
+          f"-> {linear_total:8.2f} s estimados para la categoría completa")
+    print(f"  índice por id:   {indexed_total / len(customer_ids) * 1e6:10.3f} µs/cliente "
+          f"-> {indexed_total:8.4f} s medidos (incluye construir el índice)")
+    print(f"  mejora: x{linear_total / indexed_total:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
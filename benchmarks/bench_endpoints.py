@@ -0,0 +1,234 @@
+"""
+Benchmark de extremo a extremo de todos los endpoints sin un Odoo real.
+
+Arranca benchmarks/fake_odoo.py en otro proceso con un conjunto de datos sintético del tamaño
+indicado (y, opcionalmente, latencia por llamada), apunta el servidor MCP a él y llama a cada
+endpoint a través de la aplicación ASGI (sin red entre cliente y servicio). Por endpoint informa:
+
+- latencia p50 / p90 / p99 / máxima de `--requests` peticiones (tras `--warmup` de calentamiento)
+- llamadas a Odoo y bytes enviados / recibidos de Odoo por petición (contados por el fake)
+- tamaño de la respuesta y memoria pico del servicio durante una petición (tracemalloc)
+
+Con `--output` guarda los resultados en JSON; con `--baseline` compara el p50 con otra
+ejecución guardada para detectar regresiones.
+
+Uso:
+    python benchmarks/bench_endpoints.py [--partners 10000] [--orders 10000] [--latency 0.005]
+    python benchmarks/bench_endpoints.py --orders 100000 --protocol jsonrpc --output jsonrpc.json
+    python benchmarks/bench_endpoints.py --orders 100000 --baseline jsonrpc.json
+
+Por defecto la caché de consultas está desactivada (ODOO_CACHE_TTL=0) para medir el camino
+completo hasta Odoo; `--cache-ttl 60` mide el caso con caché caliente.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_odoo  # noqa: E402
+
+# (método, ruta, cuerpo); los endpoints de datos admiten además stream=true (--stream)
+ENDPOINTS = [
+    ('GET', '/', None),
+    ('GET', '/health', None),
+    ('GET', '/tools', None),
+    ('GET', '/cache/stats', None),
+    ('GET', '/sync/stats', None),
+    ('GET', '/metrics', None),
+    ('POST', '/get_sales_data', {'days_back': 90}),
+    ('POST', '/get_customer_insights', {'segment': 'all'}),
+    ('POST', '/get_crm_opportunities', {'min_probability': 20}),
+    ('POST', '/get_product_performance', {'days_back': 90, 'top_n': 20}),
+    ('POST', '/get_sales_team_performance', {'days_back': 90}),
+    ('POST', '/search_customers', {'query': 'Cliente 12', 'limit': 10}),
+    ('POST', '/get_territorial_analysis', {'days_back': 90}),
+    ('POST', '/get_category_analysis', {'days_back': 90}),
+    ('POST', '/get_comprehensive_data', {'days_back': 90}),
+    ('POST', '/cache/flush', {}),
+]
+
+
+async def call(app, method: str, path: str, body):
+    """Petición HTTP directa a la aplicación ASGI; devuelve (estado, cuerpo)"""
+    payload = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'bench'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(payload)).encode())],
+        'client': ('127.0.0.1', 0), 'server': ('bench', 80),
+    }
+    sent = False
+    status, chunks = None, []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': payload, 'more_body': False}
+        await asyncio.Event().wait()  # Sin desconexión del cliente
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return status, b''.join(chunks)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def bench_endpoint(app, stats, method, path, body, args):
+    async def one():
+        start = time.perf_counter()
+        status, content = await call(app, method, path, body)
+        return status, content, time.perf_counter() - start
+
+    async def batch():
+        before = list(stats)
+        results = await asyncio.gather(*(one() for _ in range(args.concurrency)))
+        return results, [after - previous for after, previous in zip(stats, before)]
+
+    for _ in range(args.warmup):
+        await batch()
+
+    latencies, errors, totals, size = [], 0, [0, 0, 0], 0
+    for _ in range(args.requests):
+        results, counts = await batch()
+        for status, content, elapsed in results:
+            latencies.append(elapsed)
+            errors += status >= 400
+            size = len(content)
+        totals = [total + count for total, count in zip(totals, counts)]
+
+    tracemalloc.start()
+    await call(app, method, path, body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Contadores del fake [llamadas, bytes recibidos, bytes enviados] por petición
+    calls, sent, received = (total / len(latencies) for total in totals)
+    return {
+        'endpoint': f'{method} {path}',
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'odoo_calls': calls,
+        'odoo_bytes_sent': sent,
+        'odoo_bytes_received': received,
+        'response_bytes': size,
+        'peak_memory_mb': peak / 1024 / 1024,
+    }
+
+
+def human_bytes(value):
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f'{value:.0f} {unit}' if unit == 'B' else f'{value:.1f} {unit}'
+        value /= 1024
+    return f'{value:.1f} GB'
+
+
+async def run(args, port, stats):
+    os.environ.update(
+        ODOO_URL=f'http://127.0.0.1:{port}', ODOO_DB='bench', ODOO_USERNAME='bench', ODOO_API_KEY='bench',
+        ODOO_RPC_PROTOCOL=args.protocol, ODOO_CACHE_TTL=str(args.cache_ttl), ODOO_SYNC_INTERVAL='0')
+    import logging
+    logging.disable(logging.WARNING)
+    import odoo_mcp_api
+
+    app = odoo_mcp_api.app
+    await app.router.startup()
+    # Medir con la precarga terminada, como tras un despliegue
+    while not odoo_mcp_api.warmup.ready:
+        await asyncio.sleep(0.05)
+    try:
+        results = []
+        for method, path, body in ENDPOINTS:
+            if args.endpoints and not any(name in path for name in args.endpoints):
+                continue
+            if args.stream and body is not None and path.startswith(('/get_', '/search_')):
+                body = dict(body, stream=True)
+            results.append(await bench_endpoint(app, stats, method, path, body, args))
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def report(results, baseline):
+    base = {r['endpoint']: r for r in baseline} if baseline else {}
+    header = (f"{'endpoint':<36} {'p50':>9} {'p90':>9} {'p99':>9} {'máx':>9} {'llamadas':>9} "
+              f"{'de Odoo':>9} {'a Odoo':>9} {'respuesta':>10} {'mem pico':>9}")
+    print(header + ('  Δp50' if base else ''))
+    for r in results:
+        line = (f"{r['endpoint']:<36} {r['p50_ms']:7.1f}ms {r['p90_ms']:7.1f}ms {r['p99_ms']:7.1f}ms {r['max_ms']:7.1f}ms "
+                f"{r['odoo_calls']:9.1f} {human_bytes(r['odoo_bytes_received']):>9} {human_bytes(r['odoo_bytes_sent']):>9} "
+                f"{human_bytes(r['response_bytes']):>10} {r['peak_memory_mb']:7.1f}MB")
+        previous = base.get(r['endpoint'])
+        if previous and previous['p50_ms']:
+            line += f"  {(r['p50_ms'] / previous['p50_ms'] - 1) * 100:+.0f}%"
+        if r['errors']:
+            line += f"  ({r['errors']} errores)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partners', type=int, default=10000, help='clientes del conjunto de datos')
+    parser.add_argument('--orders', type=int, default=10000, help='pedidos del conjunto de datos')
+    parser.add_argument('--lines-per-order', type=int, default=3, help='líneas por pedido (media)')
+    parser.add_argument('--leads', type=int, default=2000, help='oportunidades del CRM')
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos de espera por llamada a Odoo')
+    parser.add_argument('--jitter', type=float, default=0.0, help='espera adicional aleatoria por llamada (segundos)')
+    parser.add_argument('--protocol', choices=('xmlrpc', 'jsonrpc'), default='xmlrpc', help='ODOO_RPC_PROTOCOL')
+    parser.add_argument('--cache-ttl', type=float, default=0, help='ODOO_CACHE_TTL del servicio')
+    parser.add_argument('--requests', type=int, default=5, help='peticiones medidas por endpoint')
+    parser.add_argument('--warmup', type=int, default=1, help='peticiones de calentamiento por endpoint')
+    parser.add_argument('--concurrency', type=int, default=1, help='peticiones idénticas simultáneas')
+    parser.add_argument('--stream', action='store_true', help='pedir las respuestas en NDJSON')
+    parser.add_argument('--no-memoize', action='store_true', help='el fake recalcula cada respuesta')
+    parser.add_argument('--endpoints', nargs='*', help='solo los endpoints cuya ruta contiene alguno de estos textos')
+    parser.add_argument('--output', help='guardar los resultados en este fichero JSON')
+    parser.add_argument('--baseline', help='resultados JSON de otra ejecución para comparar el p50')
+    args = parser.parse_args()
+
+    dataset = {'partners': args.partners, 'orders': args.orders, 'lines_per_order': args.lines_per_order, 'leads': args.leads}
+    stats = fake_odoo.new_stats()
+    start = time.perf_counter()
+    process, port = fake_odoo.start_process(dataset, stats=stats, latency=args.latency, jitter=args.jitter,
+                                           memoize=not args.no_memoize)
+    print(f"Fake Odoo listo en {time.perf_counter() - start:.1f}s ({args.partners} clientes, {args.orders} pedidos, "
+          f"~{args.orders * args.lines_per_order} líneas, {args.leads} oportunidades; latencia {args.latency * 1000:g} ms, "
+          f"{args.protocol})")
+    try:
+        results = asyncio.run(run(args, port, stats))
+    finally:
+        process.terminate()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
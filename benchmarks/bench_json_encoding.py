@@ -0,0 +1,175 @@
+"""
+Benchmark: serialización de la respuesta de get_comprehensive_data.
+
+Compara la ruta por defecto de FastAPI (jsonable_encoder + json de JSONResponse) con
+FastJSONResponse (dumps_json sin jsonable_encoder, con orjson si está instalado y con json
+de la librería estándar como alternativa). Mide el tiempo de serialización (mejor de
+`--repeat` ejecuciones) y la memoria reservada durante la serialización (pico de tracemalloc,
+incluido el resultado).
+
+Uso:
+    # Con una respuesta grabada de un servidor real
+    curl -s -X POST http://localhost:8000/get_comprehensive_data \\
+        -H "Content-Type: application/json" -d '{"days_back": 365}' > comprehensive.json
+    python benchmarks/bench_json_encoding.py --payload comprehensive.json
+
+    # Sin servidor: respuesta sintética con la forma de get_comprehensive_data
+    python benchmarks/bench_json_encoding.py [--scale 1] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import odoo_mcp_api  # noqa: E402
+
+
+def make_payload(scale=1, seed=1):
+    """Respuesta sintética de get_comprehensive_data (a escala 1, cerca de 1 MB)"""
+    rnd = random.Random(seed)
+    now = datetime(2024, 6, 30)
+
+    def m2o(prefix, n):
+        i = rnd.randint(1, n)
+        return [i, f'{prefix} {i}']
+
+    def day(max_days=365):
+        return (now - timedelta(days=rnd.randint(0, max_days), seconds=rnd.randint(0, 86000))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def customer(i):
+        revenue = round(rnd.uniform(100, 50000), 2)
+        purchases = rnd.randint(1, 40)
+        return {
+            'partner_id': i, 'name': f'Cliente {i}', 'email': f'cliente{i}@example.com',
+            'phone': f'+34 600 {i:06d}', 'mobile': False, 'street': f'Calle Mayor {i}', 'street2': False,
+            'city': f'Ciudad {rnd.randint(1, 300)}', 'state_id': m2o('Provincia', 52), 'zip': f'{rnd.randint(1000, 52999):05d}',
+            'country_id': [68, 'España'], 'vat': f'ES{i:08d}X', 'ref': f'C{i:05d}',
+            'total_revenue': revenue, 'num_purchases': purchases, 'avg_order_value': round(revenue / purchases, 2),
+            'last_order_date': day(), 'days_since_last': rnd.randint(0, 400),
+            'segment': rnd.choice(['vip', 'regular', 'at_risk', 'new', 'inactive']),
+            'customer_since': day(2000), 'ltv_score': round(revenue * rnd.random(), 2)
+        }
+
+    sales = [{
+        'id': i, 'name': f'S{i:05d}', 'partner_id': m2o('Cliente', 5000), 'date_order': day(),
+        'amount_total': round(rnd.uniform(10, 5000), 2), 'state': rnd.choice(['sale', 'done']),
+        'user_id': m2o('Vendedor', 20), 'team_id': m2o('Equipo', 4)
+    } for i in range(1, 1000 * scale + 1)]
+    opportunities = [{
+        'id': i, 'name': f'Oportunidad {i}', 'partner_id': m2o('Cliente', 5000),
+        'expected_revenue': float(rnd.randint(0, 80000)), 'probability': float(rnd.randint(0, 100)),
+        'stage_id': m2o('Etapa', 6), 'user_id': m2o('Vendedor', 20), 'team_id': m2o('Equipo', 4),
+        'date_deadline': False, 'create_date': day(), 'write_date': day()
+    } for i in range(1, 500 * scale + 1)]
+    territorial = [{
+        'state': f'Provincia {s}',
+        'total_revenue': round(rnd.uniform(1e4, 1e6), 2), 'total_orders': rnd.randint(10, 2000),
+        'num_customers': rnd.randint(5, 500), 'num_cities': rnd.randint(1, 60),
+        'avg_order_value': round(rnd.uniform(50, 3000), 2), 'market_share': round(rnd.uniform(0, 20), 2),
+        'top_cities': [{
+            'city': f'Ciudad {c}', 'revenue': round(rnd.uniform(100, 1e5), 2), 'orders': rnd.randint(1, 300),
+            'customers': rnd.sample(range(1, 5001), rnd.randint(1, 40)), 'num_customers': rnd.randint(1, 40)
+        } for c in range(20 * scale)],
+        'top_customers': [customer(rnd.randint(1, 5000)) for _ in range(10)],
+        'top_products': [{'product': f'Producto {p}', 'qty': float(rnd.randint(1, 900)),
+                          'revenue': round(rnd.uniform(10, 5e4), 2)} for p in range(10)],
+        'rfm_segmentation': {'vip': rnd.randint(0, 50), 'regular': rnd.randint(0, 300), 'at_risk': 3, 'new': 1, 'inactive': 7},
+        'growth_vs_previous_period': {'previous_revenue': round(rnd.uniform(1e4, 1e6), 2), 'growth_rate': 12.5, 'growth_amount': 3456.78}
+    } for s in range(1, 53)]
+    categories = [{
+        'category_id': c, 'category_name': f'CATEGORIA {c}', 'total_customers': rnd.randint(10, 900),
+        'revenue_period': round(rnd.uniform(1e3, 5e5), 2),
+        'top_customers': [customer(rnd.randint(1, 5000)) for _ in range(5)],
+        'top_products': [{'product': f'Producto {p}', 'qty': 12.0, 'revenue': 1234.5} for p in range(10)],
+        'rfm_segmentation': {'vip': 4, 'regular': 40, 'at_risk': 2, 'new': 1, 'inactive': 9}
+    } for c in range(1, 16)]
+
+    data = {
+        'sales': {'success': True, 'count': len(sales), 'complete': False, 'data': sales,
+                  'summary': {'total_orders': 24000, 'total_revenue': 1.2e7, 'avg_order_value': 500.0}},
+        'customers': {'success': True, 'count': 100, 'data': [customer(i) for i in range(1, 101)],
+                      'summary': {'segments': {'vip': 10, 'regular': 60, 'at_risk': 10, 'new': 5, 'inactive': 15}}},
+        'opportunities': {'success': True, 'count': len(opportunities), 'complete': True, 'data': opportunities,
+                          'pipeline_metrics': {'total_opportunities': len(opportunities)}},
+        'products': {'success': True, 'count': 20, 'data': [{'product_id': p, 'product_name': f'Producto {p}',
+                     'total_qty': 100.0, 'total_revenue': 9999.99, 'num_orders': 40} for p in range(20)]},
+        'team': {'success': True, 'count': 20, 'data': [{'user_id': u, 'user_name': f'Vendedor {u}',
+                 'total_revenue': 1e5, 'num_orders': 200, 'avg_order_value': 500.0} for u in range(20)]},
+        'territorial': {'success': True, 'count': len(territorial), 'data': territorial, 'summary': {'total_states': 52}},
+        'categories': {'success': True, 'count': len(categories), 'data': categories, 'summary': {'total_categories': 15}},
+    }
+    return {'success': True, 'partial': False, 'section_errors': {}, 'period_days': 365,
+            'generated_at': now.isoformat(), 'data': data, 'executive_summary': {'total_revenue': 1.2e7}}
+
+
+def default_fastapi(payload):
+    """Lo que hace FastAPI al devolver un dict: jsonable_encoder y JSONResponse.render"""
+    return JSONResponse(content=None).render(jsonable_encoder(payload))
+
+
+def fast_json(payload):
+    return odoo_mcp_api.FastJSONResponse(content=None).render(payload)
+
+
+def stdlib_fallback(payload):
+    orjson, odoo_mcp_api.orjson = odoo_mcp_api.orjson, None
+    try:
+        return fast_json(payload)
+    finally:
+        odoo_mcp_api.orjson = orjson
+
+
+def measure(encode, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(payload)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    body = encode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payload', help='respuesta JSON grabada de /get_comprehensive_data')
+    parser.add_argument('--scale', type=int, default=1, help='factor de tamaño de la respuesta sintética')
+    parser.add_argument('--repeat', type=int, default=20, help='repeticiones por codificador')
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+    else:
+        payload = make_payload(args.scale)
+
+    encoders = [('jsonable_encoder + json (FastAPI)', default_fastapi)]
+    if odoo_mcp_api.orjson is not None:
+        encoders.append(('FastJSONResponse (orjson)', fast_json))
+    encoders.append(('FastJSONResponse (json)', stdlib_fallback))
+
+    reference = None
+    print(f"{'codificador':<36} {'tiempo':>10} {'memoria pico':>14} {'tamaño':>10}")
+    for name, encode in encoders:
+        elapsed, peak, body = measure(encode, payload, args.repeat)
+        decoded = json.loads(body)
+        if reference is None:
+            reference, baseline = decoded, elapsed
+        assert decoded == reference, f'{name} produce un JSON distinto'
+        print(f"{name:<36} {elapsed * 1000:8.1f} ms {peak / 1024 / 1024:11.2f} MB {len(body) / 1024 / 1024:7.2f} MB"
+              f"  x{baseline / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: decodificación de un search_read grande con XML-RPC frente a JSON-RPC.
+
+Levanta un servidor local que responde a `execute_kw` en /xmlrpc/2/object y en /jsonrpc con
+el mismo resultado de search_read (pedidos sintéticos, ya serializados para no medir al
+servidor) y lo pide con los transportes del conector (`rpc_connect`, los mismos que usa
+OdooConnector según ODOO_RPC_PROTOCOL). Para cada protocolo mide:
+
+- tiempo total de la llamada (mejor de `--repeat`)
+- tiempo de CPU del hilo que llama (petición, lectura y decodificación de la respuesta)
+- memoria pico reservada durante la llamada (tracemalloc, incluido el resultado)
+
+y comprueba que ambos protocolos devuelven exactamente los mismos registros.
+
+Uso:
+    python benchmarks/bench_rpc_decoding.py [--rows 20000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import xmlrpc.client
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import odoo_mcp_api  # noqa: E402
+
+
+def make_records(rows, seed=1):
+    """Resultado de search_read de sale.order con los campos de get_sales_data"""
+    rnd = random.Random(seed)
+    now = datetime(2024, 6, 30)
+    return [{
+        'id': i,
+        'name': f'S{i:05d}',
+        'partner_id': [rnd.randint(1, 5000), f'Cliente {rnd.randint(1, 5000)}'],
+        'date_order': (now - timedelta(days=rnd.randint(0, 365), seconds=rnd.randint(0, 86000))).strftime('%Y-%m-%d %H:%M:%S'),
+        'amount_total': round(rnd.uniform(10, 5000), 2),
+        'state': rnd.choice(['sale', 'done']),
+        'user_id': [rnd.randint(1, 20), f'Vendedor {rnd.randint(1, 20)}'],
+        'team_id': rnd.choice([False, [1, 'Ventas'], [2, 'Canal HORECA']])
+    } for i in range(1, rows + 1)]
+
+
+def serve(records):
+    """Servidor HTTP/1.1 keep-alive con las respuestas de ambos protocolos ya codificadas"""
+    bodies = {
+        '/xmlrpc/2/object': ('text/xml', xmlrpc.client.dumps((records,), methodresponse=True, allow_none=True).encode()),
+        '/jsonrpc': ('application/json', json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': records}).encode()),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            content_type, body = bodies[self.path]
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, {path: len(body) for path, (_, body) in bodies.items()}
+
+
+def measure(proxy, repeat):
+    def call():
+        return proxy.execute_kw('db', 2, 'key', 'sale.order', 'search_read', [[]], {})
+
+    call()  # Abre la conexión keep-alive antes de medir
+    best_wall = best_cpu = float('inf')
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        call()
+        best_cpu = min(best_cpu, time.thread_time() - cpu)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+    tracemalloc.start()
+    result = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_wall, best_cpu, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='registros del search_read')
+    parser.add_argument('--repeat', type=int, default=5, help='llamadas medidas por protocolo')
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    server, sizes = serve(records)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    paths = {'xmlrpc': '/xmlrpc/2/object', 'jsonrpc': '/jsonrpc'}
+    decoder = 'orjson' if odoo_mcp_api.orjson is not None else 'json'
+
+    print(f"{args.rows} registros; decodificador JSON-RPC: {decoder}")
+    print(f"{'protocolo':<10} {'respuesta':>10} {'tiempo':>10} {'CPU':>10} {'memoria pico':>14}")
+    baseline = None
+    try:
+        for protocol in odoo_mcp_api.RPC_PROTOCOLS:
+            transport, proxy = odoo_mcp_api.rpc_connect(url, protocol, 'object')
+            try:
+                wall, cpu, peak, result = measure(proxy, args.repeat)
+            finally:
+                transport.close()
+            assert result == records, f'{protocol} devuelve registros distintos'
+            baseline = baseline or cpu
+            print(f"{protocol:<10} {sizes[paths[protocol]] / 1024 / 1024:7.2f} MB {wall * 1000:7.1f} ms {cpu * 1000:7.1f} ms"
+                  f" {peak / 1024 / 1024:11.2f} MB  x{baseline / cpu:.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
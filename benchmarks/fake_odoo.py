@@ -0,0 +1,458 @@
+"""
+Servidor Odoo de pruebas para los benchmarks: datos sintéticos y sin dependencias.
+
+Responde en /xmlrpc/2/common, /xmlrpc/2/object y /jsonrpc a `common.authenticate` y a
+`object.execute_kw` con search_read, search, search_count, read y read_group sobre un conjunto
+de datos generado (clientes, categorías, pedidos, líneas de pedido y oportunidades), con la
+semántica de dominios que usa el servidor MCP (operadores '&', '|', '!', campos relacionados
+'a.b', fechas sin hora comparadas con datetimes como en Odoo). read_group admite
+'alias:agg(campo)' con sum, max, min, count y count_distinct y agrupaciones 'campo:day|month'.
+
+- `latency`/`jitter`: espera por llamada (segundos) que simula la red y el tiempo de Odoo.
+- `memoize`: las peticiones idénticas se responden con la respuesta ya codificada, para que en
+  los benchmarks el coste de la búsqueda en Python no se sume al del servicio medido.
+- `stats`: llamadas y bytes recibidos/enviados, en memoria compartida entre procesos.
+
+Uso independiente (para apuntar un servidor MCP real con ODOO_URL=http://127.0.0.1:8069):
+    python benchmarks/fake_odoo.py --port 8069 --partners 10000 --orders 50000 [--latency 0.02]
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+import xmlrpc.client
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UID = 2
+
+# Campos many2one de cada modelo -> modelo relacionado
+MANY2ONE = {
+    'res.partner': {'state_id': 'res.country.state', 'country_id': 'res.country'},
+    'res.partner.category': {'parent_id': 'res.partner.category'},
+    'sale.order': {'partner_id': 'res.partner', 'user_id': 'res.users', 'team_id': 'crm.team'},
+    'sale.order.line': {'order_id': 'sale.order', 'order_partner_id': 'res.partner', 'product_id': 'product.product'},
+    'crm.lead': {'partner_id': 'res.partner', 'stage_id': 'crm.stage', 'user_id': 'res.users', 'team_id': 'crm.team'},
+}
+
+# Campos de texto de res.partner derivados del id (no se guardan para ahorrar memoria)
+PARTNER_TEXT = {
+    'name': lambda r: f"Cliente {r['id']}",
+    'email': lambda r: f"cliente{r['id']}@example.com",
+    'phone': lambda r: f"+34 600 {r['id']:06d}",
+    'mobile': lambda r: False,
+    'street': lambda r: f"Calle Mayor {r['id']}",
+    'street2': lambda r: False,
+    'zip': lambda r: f"{10000 + r['id'] % 42000:05d}",
+    'vat': lambda r: f"ES{r['id']:08d}X",
+    'ref': lambda r: f"C{r['id']:06d}",
+    'country_id': lambda r: 1,
+}
+
+
+class Table:
+    """Registros de un modelo ordenados por id"""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+        self.ids = [r['id'] for r in self.records]
+        self.by_id = {r['id']: r for r in self.records}
+
+    def add(self, record):
+        self.records.append(record)
+        self.ids.append(record['id'])
+        self.by_id[record['id']] = record
+
+
+def make_dataset(partners=10000, orders=10000, lines_per_order=3, leads=2000, categories=15, days=730, seed=1):
+    """Datos sintéticos: `orders` pedidos repartidos en `days` días y de 1 a 2*lines_per_order-1 líneas por pedido"""
+    rnd = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+
+    def stamp(max_days):
+        return (now - timedelta(days=rnd.randint(0, max_days), seconds=rnd.randint(0, 86399))).strftime('%Y-%m-%d %H:%M:%S')
+
+    db = {
+        'res.country': Table([{'id': 1, 'name': 'España'}]),
+        'res.country.state': Table({'id': i, 'name': f'Provincia {i}'} for i in range(1, 53)),
+        'res.users': Table({'id': i, 'name': f'Vendedor {i}'} for i in range(1, 21)),
+        'crm.team': Table({'id': i, 'name': f'Equipo {i}'} for i in range(1, 5)),
+        'crm.stage': Table({'id': i, 'name': name} for i, name in enumerate(['New', 'Qualified', 'Proposition', 'Won'], 1)),
+        'product.product': Table({'id': i, 'name': f'Producto {i}'} for i in range(1, 501)),
+        'res.partner.category': Table(
+            {'id': i, 'name': f'CATEGORIA {i}', 'parent_id': False, 'color': i % 12} for i in range(1, categories + 1)),
+    }
+    db['res.partner'] = Table({
+        'id': i,
+        'city': f'Ciudad {rnd.randint(1, 400)}' if rnd.random() > 0.03 else False,
+        'state_id': rnd.randint(1, 52) if rnd.random() > 0.03 else False,
+        'customer_rank': 1 if rnd.random() > 0.05 else 0,
+        'category_id': rnd.sample(range(1, categories + 1), rnd.choice((0, 1, 1, 2))) if categories else [],
+        'create_date': stamp(days * 2),
+        'write_date': stamp(days),
+    } for i in range(1, partners + 1))
+
+    db['sale.order'] = Table()
+    db['sale.order.line'] = Table()
+    line_id = 0
+    for order_id in range(1, orders + 1):
+        partner_id = rnd.randint(1, partners)
+        date_order = stamp(days)
+        total = 0.0
+        for _ in range(rnd.randint(1, max(1, 2 * lines_per_order - 1))):
+            line_id += 1
+            subtotal = round(rnd.uniform(5, 900), 2)
+            total += subtotal
+            db['sale.order.line'].add({
+                'id': line_id, 'order_id': order_id, 'order_partner_id': partner_id,
+                'product_id': rnd.randint(1, 500) if rnd.random() > 0.02 else False,
+                'product_uom_qty': float(rnd.randint(1, 20)), 'price_subtotal': subtotal, 'write_date': date_order,
+            })
+        db['sale.order'].add({
+            'id': order_id, 'name': f'S{order_id:07d}', 'partner_id': partner_id, 'date_order': date_order,
+            'amount_total': round(total, 2), 'state': rnd.choice(('sale', 'sale', 'sale', 'done', 'draft', 'cancel')),
+            'user_id': rnd.randint(1, 20) if rnd.random() > 0.05 else False, 'team_id': rnd.randint(1, 4),
+            'write_date': date_order,
+        })
+
+    db['crm.lead'] = Table({
+        'id': i, 'name': f'Oportunidad {i}', 'partner_id': rnd.randint(1, partners) if partners else False,
+        'expected_revenue': float(rnd.randint(0, 80000)), 'probability': float(rnd.randint(0, 100)),
+        'stage_id': rnd.randint(1, 4), 'user_id': rnd.randint(1, 20), 'team_id': rnd.randint(1, 4),
+        'date_deadline': False, 'create_date': stamp(days), 'write_date': stamp(days),
+    } for i in range(1, leads + 1))
+    return db
+
+
+class FakeOdoo:
+    def __init__(self, db):
+        self.db = db
+
+    # ---------- valores y dominios ----------
+
+    def _raw(self, model: str, record: dict, field: str):
+        if model == 'res.partner' and field in PARTNER_TEXT:
+            return PARTNER_TEXT[field](record)
+        return record.get(field, False)
+
+    def _getter(self, model: str, path: str):
+        """Función registro -> valor crudo de un campo, siguiendo los many2one de 'a.b.c'"""
+        field, _, rest = path.partition('.')
+        if not rest:
+            return lambda record: self._raw(model, record, field)
+        target = MANY2ONE[model][field]
+        inner = self._getter(target, rest)
+        table = self.db[target]
+
+        def get(record):
+            related = table.by_id.get(record.get(field))
+            return inner(related) if related is not None else False
+        return get
+
+    @staticmethod
+    def _compare(op: str, value):
+        if op == '=':
+            return lambda v: (v == value) if not isinstance(v, list) else value in v
+        if op == '!=':
+            return lambda v: v != value
+        if op in ('in', 'not in'):
+            values = set(value)
+            contains = lambda v: bool(values.intersection(v)) if isinstance(v, list) else v in values  # noqa: E731
+            return contains if op == 'in' else (lambda v: not contains(v))
+        if op in ('ilike', 'like'):
+            needle = str(value).lower() if op == 'ilike' else str(value)
+            return lambda v: bool(v) and needle in (str(v).lower() if op == 'ilike' else str(v))
+
+        def bound(v):
+            # Como en Odoo, una fecha sin hora frente a un datetime abarca el día completo
+            if isinstance(value, str) and len(value) == 10 and isinstance(v, str) and len(v) == 19:
+                return value + (' 23:59:59' if op in ('>', '<=') else ' 00:00:00')
+            return value
+        ops = {'>': lambda a, b: a > b, '>=': lambda a, b: a >= b, '<': lambda a, b: a < b, '<=': lambda a, b: a <= b}
+        if op not in ops:
+            raise ValueError(f'Unsupported operator {op!r}')
+        compare = ops[op]
+        return lambda v: v is not False and v is not None and compare(v, bound(v))
+
+    def _compile(self, model: str, domain: list):
+        """Predicado registro -> bool de un dominio en notación polaca"""
+        stack = []
+        for token in reversed(domain):
+            if token == '!':
+                term = stack.pop()
+                stack.append(lambda r, t=term: not t(r))
+            elif token in ('&', '|'):
+                a, b = stack.pop(), stack.pop()
+                stack.append((lambda r, a=a, b=b: a(r) and b(r)) if token == '&' else (lambda r, a=a, b=b: a(r) or b(r)))
+            else:
+                field, op, value = token
+                get, test = self._getter(model, field), self._compare(op, value)
+                stack.append(lambda r, get=get, test=test: test(get(r)))
+        return lambda r: all(term(r) for term in stack)
+
+    def _search(self, model: str, domain: list, order: str = None, offset: int = 0, limit: int = None):
+        table = self.db[model]
+        records = table.records
+        # Paginación por id (['id', '>', n] con order 'id'): empezar donde terminó la página anterior
+        if (order or 'id') == 'id' and all(isinstance(t, (list, tuple)) for t in domain):
+            for field, op, value in domain:
+                if field == 'id' and op == '>':
+                    records = records[bisect_right(table.ids, value):]
+        match = self._compile(model, domain)
+        if not order or order == 'id':
+            found = []
+            for record in records:
+                if match(record):
+                    found.append(record)
+                    if limit and len(found) >= offset + limit:
+                        break
+        else:
+            found = [record for record in records if match(record)]
+            for part in reversed([p.strip() for p in order.split(',')]):
+                name, _, direction = part.partition(' ')
+                get = self._getter(model, name)
+                # Los valores vacíos van al final, como los NULL de PostgreSQL en orden ascendente
+                found.sort(key=lambda r: (get(r) in (False, None), get(r) or 0), reverse=direction.strip().lower() == 'desc')
+        return found[offset:offset + limit] if limit else found[offset:]
+
+    def _value(self, model: str, field: str, raw):
+        target = MANY2ONE.get(model, {}).get(field)
+        if target:
+            related = self.db[target].by_id.get(raw)
+            return [raw, self._raw(target, related, 'name')] if related else False
+        return raw
+
+    def _row(self, model: str, record: dict, fields: list):
+        row = {'id': record['id']}
+        for field in fields:
+            row[field] = self._value(model, field, self._raw(model, record, field))
+        return row
+
+    # ---------- métodos RPC ----------
+
+    def authenticate(self, db, login, password, context=None):
+        return UID
+
+    def version(self):
+        return {'server_version': '17.0', 'server_serie': '17.0'}
+
+    def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        kwargs = kwargs or {}
+        if model not in self.db:
+            raise ValueError(f"Object {model} doesn't exist")
+        if method == 'search_read':
+            domain = args[0] if args else kwargs.get('domain', [])
+            records = self._search(model, domain, kwargs.get('order'), kwargs.get('offset') or 0, kwargs.get('limit'))
+            fields = kwargs.get('fields') or (args[1] if len(args) > 1 else None)
+            if not fields:
+                fields = [f for f in records[0] if f != 'id'] if records else []
+            return [self._row(model, record, fields) for record in records]
+        if method == 'search':
+            return [r['id'] for r in self._search(model, args[0], kwargs.get('order'), kwargs.get('offset') or 0, kwargs.get('limit'))]
+        if method == 'search_count':
+            return len(self._search(model, args[0]))
+        if method == 'read':
+            fields = kwargs.get('fields') or (args[1] if len(args) > 1 else [])
+            table = self.db[model]
+            return [self._row(model, table.by_id[i], fields) for i in args[0] if i in table.by_id]
+        if method == 'read_group':
+            return self._read_group(model, args, kwargs)
+        raise ValueError(f'Method {method} not supported by the fake Odoo server')
+
+    def _read_group(self, model: str, args: list, kwargs: dict):
+        domain = args[0]
+        specs = args[1] if len(args) > 1 else kwargs.get('fields', [])
+        groupby = args[2] if len(args) > 2 else kwargs.get('groupby', [])
+        groupby = [groupby] if isinstance(groupby, str) else groupby
+        lazy = kwargs.get('lazy', True)
+        if lazy and len(groupby) > 1:
+            groupby = groupby[:1]
+
+        keys = []
+        for gb in groupby:
+            field, _, granularity = gb.partition(':')
+            get = self._getter(model, field)
+            if granularity == 'month':
+                keys.append(lambda r, get=get: (get(r) or '')[:7] + '-01' if get(r) else False)
+            elif granularity == 'day':
+                keys.append(lambda r, get=get: (get(r) or '')[:10] if get(r) else False)
+            else:
+                keys.append(get)
+        aggregates = []
+        for spec in specs:
+            alias, _, expr = spec.partition(':')
+            if not expr:
+                continue
+            func, _, field = expr.rstrip(')').partition('(')
+            aggregates.append((alias, func, self._getter(model, field or alias)))
+
+        groups = {}
+        for record in self._search(model, domain):
+            key = tuple(get(record) for get in keys)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, [[] for _ in aggregates]]
+            group[0] += 1
+            for values, (_, _, get) in zip(group[1], aggregates):
+                value = get(record)
+                if value is not False and value is not None:
+                    values.append(value)
+
+        result = []
+        for key, (count, values_list) in groups.items():
+            row = {}
+            for gb, value in zip(groupby, key):
+                field, _, granularity = gb.partition(':')
+                if granularity:
+                    # Odoo devuelve una etiqueta localizada y el rango del cubo en __range
+                    row[gb] = value or False
+                    if value:
+                        row.setdefault('__range', {})[gb] = {'from': f'{value} 00:00:00', 'to': f'{value} 23:59:59'}
+                else:
+                    row[gb] = self._value(model, field, value)
+            row['__count'] = count
+            if lazy and groupby:
+                row[f'{groupby[0].split(":")[0]}_count'] = count
+            for values, (alias, func, _) in zip(values_list, aggregates):
+                if func == 'sum':
+                    row[alias] = sum(values)
+                elif func == 'max':
+                    row[alias] = max(values) if values else False
+                elif func == 'min':
+                    row[alias] = min(values) if values else False
+                elif func == 'count':
+                    row[alias] = count
+                elif func == 'count_distinct':
+                    row[alias] = len(set(values))
+                else:
+                    raise ValueError(f'Aggregate {func} not supported by the fake Odoo server')
+            result.append(row)
+        return result
+
+
+def make_handler(fake: FakeOdoo, latency: float = 0.0, jitter: float = 0.0, memoize: bool = True, stats=None):
+    """Handler HTTP/1.1 (keep-alive) para XML-RPC y JSON-RPC sobre `fake`"""
+    responses = {}  # cuerpo de la petición -> (content-type, cuerpo de la respuesta)
+    lock = threading.Lock()
+    methods = {'authenticate': fake.authenticate, 'version': fake.version, 'execute_kw': fake.execute_kw}
+
+    def xmlrpc_body(request: bytes):
+        params, method = xmlrpc.client.loads(request, use_builtin_types=True)
+        try:
+            response = xmlrpc.client.dumps((methods[method](*params),), methodresponse=True, allow_none=True)
+        except Exception as e:
+            response = xmlrpc.client.dumps(xmlrpc.client.Fault(1, f'Traceback (most recent call last):\n{type(e).__name__}: {e}'),
+                                           allow_none=True)
+        return 'text/xml', response.encode()
+
+    def jsonrpc_body(request: bytes):
+        payload = json.loads(request)
+        params = payload['params']
+        response = {'jsonrpc': '2.0', 'id': payload.get('id')}
+        try:
+            response['result'] = methods[params['method']](*params['args'])
+        except Exception as e:
+            response['error'] = {'code': 200, 'message': 'Odoo Server Error', 'data': {
+                'name': type(e).__name__, 'message': str(e),
+                'debug': f'Traceback (most recent call last):\n{type(e).__name__}: {e}'}}
+        return 'application/json', json.dumps(response).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path not in ('/xmlrpc/2/common', '/xmlrpc/2/object', '/jsonrpc'):
+                self.send_error(404)
+                return
+            if latency or jitter:
+                time.sleep(latency + random.uniform(0, jitter))
+            key = (self.path, request)
+            cached = responses.get(key) if memoize else None
+            if cached is None:
+                cached = (jsonrpc_body if self.path == '/jsonrpc' else xmlrpc_body)(request)
+                if memoize:
+                    with lock:
+                        responses[key] = cached
+            content_type, body = cached
+            if stats is not None:
+                # Antes de responder: el cliente lee los contadores en cuanto recibe la respuesta
+                with stats.get_lock():
+                    stats[0] += 1
+                    stats[1] += len(request)
+                    stats[2] += len(body)
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def new_stats():
+    """Contadores compartidos entre procesos: [llamadas, bytes recibidos, bytes enviados]"""
+    return multiprocessing.get_context('spawn').Array('q', 3)
+
+
+def serve(fake: FakeOdoo, host: str = '127.0.0.1', port: int = 0, **options):
+    """Arranca el servidor en un hilo y lo devuelve (el puerto está en server.server_address[1])"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake, **options))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve_process(dataset: dict, options: dict, ready):
+    server = serve(FakeOdoo(make_dataset(**dataset)), **options)
+    ready.send(server.server_address[1])
+    ready.close()
+    threading.Event().wait()
+
+
+def start_process(dataset: dict, stats=None, **options):
+    """
+    Genera los datos y sirve en otro proceso, para que ni la generación ni las búsquedas compitan
+    por el GIL con el servicio medido. Devuelve (proceso, puerto).
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_serve_process, args=(dataset, dict(options, stats=stats), sender), daemon=True)
+    process.start()
+    sender.close()
+    return process, receiver.recv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8069)
+    parser.add_argument('--partners', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--lines-per-order', type=int, default=3)
+    parser.add_argument('--leads', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos de espera por llamada')
+    parser.add_argument('--jitter', type=float, default=0.0, help='espera adicional aleatoria (0..jitter segundos)')
+    parser.add_argument('--no-memoize', action='store_true', help='recalcular también las peticiones repetidas')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    db = make_dataset(args.partners, args.orders, args.lines_per_order, args.leads)
+    print(f"Datos generados en {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f'{model} {len(table.records)}' for model, table in db.items()))
+    server = serve(FakeOdoo(db), args.host, args.port, latency=args.latency, jitter=args.jitter, memoize=not args.no_memoize)
+    print(f"Fake Odoo en http://{args.host}:{server.server_address[1]} (db cualquiera, usuario y clave cualesquiera)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# compression.py - Compresión de respuestas HTTP negociada por Accept-Encoding
+"""
+Middleware ASGI que comprime las respuestas con brotli (si el paquete `brotli` está instalado)
+o gzip, según lo que acepte el cliente.
+
+Las respuestas de un solo bloque se comprimen si superan `minimum_size` bytes. Las respuestas
+en streaming (NDJSON) se comprimen bloque a bloque vaciando el compresor tras cada uno, de modo
+que el cliente puede descomprimir cada línea en cuanto llega.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+
+def _accepted_encodings(header: str) -> dict:
+    """{codificación: q} de una cabecera Accept-Encoding"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header: str):
+    """'br', 'gzip' o None según Accept-Encoding (a igual preferencia, brotli)"""
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Comprime un bloque y vacía el compresor para poder enviarlo ya"""
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    def _compressed_headers(self, length: int = None):
+        headers = MutableHeaders(raw=self.start_message['headers'])
+        headers['Content-Encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+        if length is None:
+            del headers['Content-Length']
+        else:
+            headers['Content-Length'] = str(length)
+
+    async def send_wrapper(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            # Respuestas ya codificadas (o sin cuerpo) se envían tal cual
+            self.passthrough = 'content-encoding' in Headers(raw=message['headers'])
+            return
+        if message['type'] != 'http.response.body' or self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Respuesta pequeña: comprimirla no compensa
+                self.passthrough = True
+                await self.send(self.start_message)
+                self.start_message = None
+                await self.send(message)
+                return
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            if not more_body:
+                compressed = self.compressor.finish(body)
+                self._compressed_headers(len(compressed))
+                await self.send(self.start_message)
+                await self.send({'type': 'http.response.body', 'body': compressed})
+                return
+            self._compressed_headers()
+            await self.send(self.start_message)
+            self.start_message = None
+
+        data = self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+        await self.send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
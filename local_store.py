@@ -0,0 +1,109 @@
+# local_store.py - Réplica local en SQLite de los modelos de Odoo usados por los análisis
+"""
+Almacén embebido (SQLite) con una copia de los registros de Odoo que sincroniza OdooReplica.
+
+Cada registro se guarda como JSON junto a su id y write_date. Por modelo se guarda también la
+marca de agua de la sincronización incremental (último write_date e id leídos), los campos
+replicados y la hora de la última sincronización completa. Si los campos replicados cambian
+(nueva versión del servicio), el modelo se vacía y se vuelve a sincronizar desde cero.
+"""
+import json
+import sqlite3
+import threading
+
+
+class LocalStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    model TEXT PRIMARY KEY,
+                    fields TEXT NOT NULL,
+                    watermark_date TEXT,
+                    watermark_id INTEGER,
+                    synced_at REAL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    model TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    write_date TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (model, id)
+                )""")
+
+    def prepare(self, model: str, fields) -> dict:
+        """
+        Devuelve el estado de sincronización del modelo ({'watermark': (write_date, id) o None,
+        'synced_at': timestamp o None}). Si los campos replicados han cambiado, vacía el modelo.
+        """
+        signature = json.dumps(sorted(fields))
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT fields, watermark_date, watermark_id, synced_at FROM sync_state WHERE model = ?", (model,)
+            ).fetchone()
+            if row is None or row[0] != signature:
+                self._conn.execute("DELETE FROM records WHERE model = ?", (model,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (model, fields, watermark_date, watermark_id, synced_at) "
+                    "VALUES (?, ?, NULL, NULL, NULL)", (model, signature))
+                return {'watermark': None, 'synced_at': None}
+        watermark = (row[1], row[2]) if row[1] is not None else None
+        return {'watermark': watermark, 'synced_at': row[3]}
+
+    def load(self, model: str) -> list:
+        """Todos los registros replicados del modelo, ordenados por id"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM records WHERE model = ? ORDER BY id", (model,)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def state(self, model: str) -> dict:
+        """Estado de sincronización del modelo tal como lo dejó el proceso que sincroniza (sin modificarlo)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark_date, watermark_id, synced_at FROM sync_state WHERE model = ?", (model,)
+            ).fetchone()
+        if row is None:
+            return {'watermark': None, 'synced_at': None}
+        return {'watermark': (row[0], row[1]) if row[0] is not None else None, 'synced_at': row[2]}
+
+    def changed_since(self, model: str, watermark) -> list:
+        """Registros escritos después de la marca de agua (write_date, id), en el orden de la sincronización"""
+        query = "SELECT data FROM records WHERE model = ?"
+        params = [model]
+        if watermark:
+            query += " AND (write_date > ? OR (write_date = ? AND id > ?))"
+            params += [watermark[0], watermark[0], watermark[1]]
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY write_date, id", params).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def ids(self, model: str) -> set:
+        with self._lock:
+            return {record_id for record_id, in self._conn.execute("SELECT id FROM records WHERE model = ?", (model,))}
+
+    def upsert(self, model: str, records: list, watermark):
+        """Inserta o actualiza registros y avanza la marca de agua en la misma transacción"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records (model, id, write_date, data) VALUES (?, ?, ?, ?)",
+                [(model, r['id'], r.get('write_date') or None, json.dumps(r)) for r in records])
+            self._conn.execute(
+                "UPDATE sync_state SET watermark_date = ?, watermark_id = ? WHERE model = ?",
+                (watermark[0], watermark[1], model))
+
+    def delete(self, model: str, ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM records WHERE model = ? AND id = ?", [(model, i) for i in ids])
+
+    def mark_synced(self, model: str, synced_at: float):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sync_state SET synced_at = ? WHERE model = ?", (synced_at, model))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
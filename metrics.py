@@ -0,0 +1,177 @@
+# metrics.py - Métricas en formato de texto de Prometheus
+"""
+Contadores, gauges e histogramas con etiquetas y su exposición en el formato de texto de
+Prometheus (versión 0.0.4), sin dependencias externas.
+
+`MetricsMiddleware` mide cada petición HTTP (latencia hasta el último byte de la respuesta,
+también en streaming, y peticiones en curso) etiquetada con la ruta de FastAPI, no con la URL,
+para que el número de series no crezca con los parámetros.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Starlette añade "; charset=utf-8" a los tipos text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Segundos: de llamadas de milisegundos a informes completos de minutos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}  # tupla de valores de etiquetas -> valor
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key: tuple, extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _samples(self, key, value):
+        yield self.name, self._labels(key), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            for name, labels, sample in self._samples(key, value):
+                lines.append(f'{name}{labels} {_format_value(sample)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [recuento por cubo (no acumulado; el último es +Inf), suma]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def _samples(self, key, value):
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f'{self.name}_bucket', self._labels(key, f'le="{_format_value(float(bound))}"'), cumulative
+        yield f'{self.name}_sum', self._labels(key), total
+        yield f'{self.name}_count', self._labels(key), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra la latencia y las peticiones HTTP en curso por ruta"""
+
+    def __init__(self, app, duration: Histogram, in_flight: Gauge):
+        self.app = app
+        self.duration = duration
+        self.in_flight = in_flight
+
+    @staticmethod
+    def _endpoint(scope) -> str:
+        # FastAPI guarda la ruta resuelta en el scope; sin ella (404) se agrupan todas
+        route = scope.get('route')
+        return getattr(route, 'path', None) or 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        finished = False
+        self.in_flight.inc()
+
+        def done():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            self.in_flight.dec()
+            self.duration.observe(time.perf_counter() - start, endpoint=self._endpoint(scope),
+                                  method=scope['method'], status=status)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                done()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            done()
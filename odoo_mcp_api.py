@@ -1,21 +1,72 @@
 # odoo_mcp_api.py - VERSIÓN CON ANÁLISIS TERRITORIAL EXHAUSTIVO v1.2.0
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import xmlrpc.client
 import json
+import rfm_engine
+from compression import CompressionMiddleware
+from local_store import LocalStore
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, Registry
+from sales_aggregates import SalesAggregates
+from shared_cache import SharedCache, digest as shared_key, open_shared_cache
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Literal, Optional, List
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import contextvars
+import functools
+import gzip
+import http.client
+import itertools
+import random
+import select
+import socket
+import threading
+import time
 import os
 import logging
+import urllib.parse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se serializa con json
+    orjson = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _json_default(value):
+    """Tipos que json no serializa, convertidos como lo haría jsonable_encoder"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def dumps_json(content) -> bytes:
+    """Serializa a JSON en UTF-8 con orjson si está instalado (mismo resultado con json)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada con dumps_json. Los endpoints la devuelven ya construida con sus
+    dicts de tipos primitivos, de modo que FastAPI no recorre la respuesta con jsonable_encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
 app = FastAPI(
     title="Odoo MCP Server for Claude",
     description="Marketing & Sales Manager AI - Odoo Data Access with Enhanced Territorial and Category Analysis",
-    version="1.3.0"
+    version="1.3.0",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -26,44 +77,1626 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli según Accept-Encoding para respuestas de más de COMPRESSION_MIN_SIZE bytes
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')))
+
+# ==================== MÉTRICAS (GET /metrics) ====================
+
+METRICS = Registry()
+ODOO_CALL_SECONDS = METRICS.histogram(
+    'odoo_call_duration_seconds', 'Duration of execute_kw calls to Odoo, including the wait for a pooled connection',
+    ('model', 'method'))
+ODOO_CALL_RECORDS = METRICS.histogram(
+    'odoo_call_records', 'Records returned by execute_kw calls to Odoo', ('model', 'method'),
+    buckets=(0, 1, 10, 100, 1000, 5000, 10000, 50000, 100000))
+ODOO_CALL_BYTES = METRICS.histogram(
+    'odoo_call_response_bytes', 'Response body bytes received from Odoo per execute_kw call', ('model', 'method'),
+    buckets=(1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2))
+ODOO_CALL_ERRORS = METRICS.counter(
+    'odoo_call_errors_total',
+    'Failed execute_kw calls (kind: fault = Odoo error, unavailable = transient errors or open circuit, error = other)',
+    ('model', 'method', 'kind'))
+ODOO_CALL_RETRIES = METRICS.counter(
+    'odoo_call_retries_total', 'execute_kw calls retried after a transient error', ('model', 'method'))
+ODOO_CALLS_IN_FLIGHT = METRICS.gauge('odoo_calls_in_flight', 'execute_kw calls to Odoo in progress')
+CACHE_LOOKUPS = METRICS.counter(
+    'odoo_cache_lookups_total', 'Query cache lookups by result (hit/miss/stale)', ('model', 'method', 'result'))
+LOCAL_ANSWERS = METRICS.counter(
+    'odoo_local_answers_total', 'Queries answered from the request snapshot or the local replica without calling Odoo',
+    ('model', 'method'))
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    'http_request_duration_seconds', 'HTTP request duration until the last response byte, by route',
+    ('endpoint', 'method', 'status'))
+HTTP_REQUESTS_IN_FLIGHT = METRICS.gauge('http_requests_in_flight', 'HTTP requests in progress')
+
+# Último middleware añadido = el más externo: mide también la compresión y el streaming
+app.add_middleware(MetricsMiddleware, duration=HTTP_REQUEST_SECONDS, in_flight=HTTP_REQUESTS_IN_FLIGHT)
+
+# Métodos de solo lectura cuyos resultados se pueden cachear
+CACHEABLE_METHODS = {'search_read', 'read_group', 'search_count', 'search', 'read', 'name_search', 'fields_get'}
+
+# Aciertos/fallos de caché de la petición HTTP en curso (lo rellena execute_kw)
+request_cache_stats = contextvars.ContextVar('request_cache_stats', default=None)
+
+# Instantánea de datos compartida por las secciones de la petición en curso (ver DatasetSnapshot)
+request_snapshot = contextvars.ContextVar('request_snapshot', default=None)
+
+# Traza de la petición en curso si se pidió con debug_timing (ver RequestTrace)
+request_trace = contextvars.ContextVar('request_trace', default=None)
+
+# Evento que run_async activa si se cancela la espera de la función que ejecuta en el pool: las
+# llamadas a Odoo que queden de esa función (páginas de search_read_iter...) ya no se hacen
+call_cancelled = contextvars.ContextVar('call_cancelled', default=None)
+
+# Activo mientras la precarga refresca sus conjuntos de datos: se consulta Odoo aunque haya caché
+cache_refresh = contextvars.ContextVar('cache_refresh', default=False)
+
+# Las trazas se escriben como una línea JSON por petición en este logger
+trace_logger = logging.getLogger(f"{__name__}.trace")
+
+class RequestTrace:
+    """
+    Traza de una petición con debug_timing: cada execute_kw (modelo, método, hojas del dominio,
+    filas, duración y origen del resultado: odoo, cache, local o aggregates) y cada fase de
+    cálculo marcada con PhaseTimer. `offset_seconds` es el instante de inicio respecto al de la
+    petición, para ver qué llamadas se solapan.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.calls = []
+        self.phases = []
+
+    def add_call(self, model: str, method: str, args: list, result, start: float, source: str, error: str = None):
+        domain = args[0] if args and method in ('search_read', 'read_group', 'search_count', 'search') else None
+        call = {
+            "model": model,
+            "method": method,
+            "domain_leaves": len(domain) if isinstance(domain, list) else None,
+            "rows": len(result) if isinstance(result, list) else (0 if error else 1),
+            "seconds": round(time.perf_counter() - start, 4),
+            "offset_seconds": round(start - self.started, 4),
+            "source": source
+        }
+        if error:
+            call["error"] = error
+        self.calls.append(call)
+
+    def summary(self):
+        odoo_calls = [call for call in self.calls if call["source"] == "odoo"]
+        return {
+            "endpoint": self.endpoint,
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "odoo_calls": len(odoo_calls),
+            "odoo_seconds": round(sum(call["seconds"] for call in odoo_calls), 4),
+            "calls": self.calls,
+            "phases": self.phases
+        }
+
+    def log(self, error: str = None):
+        event = {"event": "request_trace", **self.summary()}
+        if error:
+            event["error"] = error
+        trace_logger.info(dumps_json(event).decode())
+
+    async def stream(self, body):
+        """Cuerpo NDJSON seguido de una última línea {"type": "trace", ...}"""
+        async for chunk in body:
+            yield chunk
+        yield dumps_json({"type": "trace", **self.summary()}) + b"\n"
+        self.log()
+
+class PhaseTimer:
+    """
+    Marca el final de cada fase de un endpoint (`mark(nombre)` registra el tiempo desde la marca
+    anterior). Sin traza activa no registra nada.
+    """
+
+    def __init__(self, endpoint: str):
+        self.trace = request_trace.get()
+        self.endpoint = endpoint
+        self.last = time.perf_counter()
+
+    def mark(self, phase: str):
+        if self.trace is None:
+            return
+        now = time.perf_counter()
+        self.trace.phases.append({"endpoint": self.endpoint, "phase": phase, "seconds": round(now - self.last, 4)})
+        self.last = now
+
+class QueryCache:
+    """
+    Caché TTL + LRU de resultados de Odoo, acotada por número de entradas y por memoria
+    (tamaño estimado como JSON). Los resultados se comparten entre peticiones: no mutarlos.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, stale_ttl: float = 0,
+                 shared: SharedCache = None, lock_timeout: float = 30):
+        self.ttl = ttl
+        # Segundos que se conservan las entradas caducadas para servirlas si Odoo no responde
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, model, size, value)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        # Segundo nivel común a todos los workers (ODOO_SHARED_CACHE); None = solo este proceso
+        self.shared = shared
+        self.lock_timeout = lock_timeout
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _normalize_domain(domain):
+        # Sin operadores '&', '|', '!' todas las hojas se combinan con AND y su orden es irrelevante
+        if not isinstance(domain, list) or not all(isinstance(leaf, (list, tuple)) for leaf in domain):
+            return domain
+        leaves = []
+        for field, operator, value in domain:
+            if operator in ('in', 'not in') and isinstance(value, (list, tuple)):
+                value = sorted(value, key=repr)
+            leaves.append([field, operator, value])
+        return sorted(leaves, key=lambda leaf: json.dumps(leaf, default=str))
+
+    def make_key(self, model: str, method: str, args: list, kwargs: dict):
+        args = list(args)
+        if args and method in ('search_read', 'read_group', 'search_count', 'search'):
+            args[0] = self._normalize_domain(args[0])
+        kwargs = dict(kwargs)
+        if isinstance(kwargs.get('fields'), list) and method != 'read_group':
+            kwargs['fields'] = sorted(kwargs['fields'])
+        return json.dumps([model, method, args, kwargs], sort_keys=True, default=str)
+
+    def get(self, key, model: str = None):
+        """Devuelve (True, valor) si la clave está en caché (de este proceso o compartida) y no ha caducado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry[0] >= now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[3]
+            if entry is not None and entry[0] + self.stale_ttl < now:
+                self._remove(key)
+        found, value = self._get_shared(key, model) if self.shared is not None else (False, None)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found, value
+
+    def get_stale(self, key):
+        """Devuelve (True, valor) con la entrada aunque haya caducado, si sigue dentro de stale_ttl"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] + self.stale_ttl < time.monotonic():
+                return False, None
+            self.stale_hits += 1
+            return True, entry[3]
+
+    def _get_shared(self, key, model):
+        """Busca la clave en la caché compartida y la copia a la de este proceso hasta su caducidad"""
+        try:
+            entry = self.shared.get(shared_key(key))
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"⚠️  Shared cache read failed: {e}")
+            return False, None
+        if entry is None:
+            self.shared_misses += 1
+            return False, None
+        encoded, expires_at = entry
+        self.shared_hits += 1
+        value = json.loads(encoded)
+        self._store(key, model, value, len(encoded), expires_at - time.time())
+        return True, value
+
+    def set(self, key, model: str, value):
+        encoded = json.dumps(value, default=str).encode()
+        self._store(key, model, value, len(encoded), self.ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(shared_key(key), model, encoded, self.ttl)
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning(f"⚠️  Shared cache write failed: {e}")
+
+    def _store(self, key, model: str, value, size: int, ttl: float):
+        if size > self.max_bytes or ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, model, size, value)
+            self.total_bytes += size
+            # Expulsar las entradas menos usadas hasta respetar los límites
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def load(self, key, model: str, loader, refresh: bool = False):
+        """
+        Ejecuta `loader()` tras un fallo de caché y guarda el resultado. Con caché compartida,
+        solo un worker consulta Odoo por clave; los demás esperan y reutilizan su resultado
+        (salvo con `refresh`, que siempre sustituye la entrada por una consulta nueva).
+        Devuelve (True si se consultó Odoo aquí, valor).
+        """
+        if self.shared is None:
+            value = loader()
+            self.set(key, model, value)
+            return True, value
+
+        loaded = False
+
+        def load_and_publish():
+            nonlocal loaded
+            loaded = True
+            value = loader()
+            self.set(key, model, value)
+            return value
+
+        try:
+            lookup = (lambda: (False, None)) if refresh else (lambda: self._get_shared(key, model))
+            return self.shared.once(f"fill:{shared_key(key)}", load_and_publish, lookup, self.lock_timeout)
+        except Exception as e:
+            if loaded:
+                raise
+            # Backend caído: se consulta Odoo sin coordinarse con los demás workers
+            self.shared_errors += 1
+            logger.warning(f"⚠️  Shared cache lock failed, querying Odoo directly: {e}")
+            return True, load_and_publish()
+
+    def _remove(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def invalidate(self, model: str = None):
+        """
+        Elimina las entradas de un modelo (o todas si no se indica) y devuelve cuántas se borraron
+        (de la caché compartida si la hay). Los demás workers conservan su copia en memoria hasta
+        que caduca (como mucho ODOO_CACHE_TTL).
+        """
+        with self._lock:
+            keys = [k for k, entry in self._entries.items() if model is None or entry[1] == model]
+            for key in keys:
+                self._remove(key)
+        if self.shared is not None:
+            try:
+                return self.shared.invalidate(model)
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning(f"⚠️  Shared cache invalidation failed: {e}")
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_ttl_seconds": self.stale_ttl,
+                "stale_hits": self.stale_hits
+            }
+        if self.shared is not None:
+            try:
+                stats["shared"] = self.shared.stats()
+            except Exception as e:
+                stats["shared"] = {"backend": self.shared.backend, "error": str(e)}
+            stats["shared"].update(hits=self.shared_hits, misses=self.shared_misses, errors=self.shared_errors)
+        return stats
+
+class KeepAliveTransport(xmlrpc.client.Transport):
+    """Transporte XML-RPC que mantiene abierta la conexión HTTP/1.1 entre llamadas"""
+
+    # Bytes del cuerpo de la última respuesta (según Content-Length)
+    response_bytes = 0
+    # Segundos de espera máximos al conectar y en cada lectura del socket (None = sin límite)
+    timeout = None
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+    def parse_response(self, response):
+        self.response_bytes = int(response.getheader('Content-Length') or 0)
+        return super().parse_response(response)
+
+    def is_alive(self):
+        """
+        Comprueba sin bloquear que la conexión ociosa sigue abierta. Una conexión en reposo
+        no debe tener datos pendientes: si el socket es legible, el servidor la ha cerrado.
+        """
+        connection = self._connection[1]
+        sock = connection.sock if connection is not None else None
+        if sock is None:
+            return True  # Aún sin conectar: se abrirá en la próxima llamada
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+class KeepAliveSafeTransport(KeepAliveTransport, xmlrpc.client.SafeTransport):
+    """Variante HTTPS de KeepAliveTransport"""
+
+class JsonRpcTransport(KeepAliveTransport):
+    """
+    Transporte keep-alive para el endpoint /jsonrpc de Odoo: misma conexión HTTP y mismos
+    reintentos que XML-RPC, pero el cuerpo es JSON y la respuesta se decodifica de una vez
+    (orjson si está instalado) en lugar de con las callbacks de expat de xmlrpc.client.
+    """
+
+    def send_headers(self, connection, headers):
+        headers = [(name, 'application/json' if name == 'Content-Type' else value) for name, value in headers]
+        super().send_headers(connection, headers)
+
+    def parse_response(self, response):
+        body = response.read()
+        self.response_bytes = len(body)
+        if response.getheader('Content-Encoding', '') == 'gzip':
+            body = gzip.decompress(body)
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+
+class JsonRpcSafeTransport(JsonRpcTransport, xmlrpc.client.SafeTransport):
+    """Variante HTTPS de JsonRpcTransport"""
+
+class JsonRpcProxy:
+    """
+    Equivalente a xmlrpc.client.ServerProxy sobre /jsonrpc: `proxy.metodo(*args)` llama al
+    método del servicio de Odoo ('common', 'object') y los errores de Odoo se lanzan como
+    xmlrpc.client.Fault, igual que con XML-RPC.
+    """
+
+    def __init__(self, url: str, service: str, transport: JsonRpcTransport):
+        parts = urllib.parse.urlsplit(url)
+        self._host = parts.netloc
+        self._handler = parts.path or '/jsonrpc'
+        self._service = service
+        self._transport = transport
+        self._ids = itertools.count(1)
+
+    def __getattr__(self, method: str):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return functools.partial(self._call, method)
+
+    def _call(self, method: str, *args):
+        payload = {
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": self._service, "method": method, "args": args},
+            "id": next(self._ids)
+        }
+        response = self._transport.request(self._host, self._handler, dumps_json(payload))
+        error = response.get('error')
+        if error:
+            data = error.get('data') or {}
+            raise xmlrpc.client.Fault(error.get('code', 1), data.get('debug') or data.get('message') or error.get('message', ''))
+        return response.get('result')
+
+# Protocolos RPC de Odoo admitidos (ODOO_RPC_PROTOCOL)
+RPC_PROTOCOLS = ('xmlrpc', 'jsonrpc')
+
+def rpc_connect(url: str, protocol: str, service: str, timeout: float = None):
+    """(transporte keep-alive, proxy) para un servicio de Odoo ('common', 'object') con el protocolo indicado"""
+    https = url.startswith('https')
+    if protocol == 'jsonrpc':
+        transport = JsonRpcSafeTransport() if https else JsonRpcTransport()
+        transport.timeout = timeout
+        return transport, JsonRpcProxy(f'{url}/jsonrpc', service, transport)
+    transport = KeepAliveSafeTransport() if https else KeepAliveTransport()
+    transport.timeout = timeout
+    return transport, xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/{service}', transport=transport)
+
+class RpcConnectionPool:
+    """
+    Pool de conexiones RPC persistentes (XML-RPC o JSON-RPC) a un servicio de Odoo.
+
+    Cada llamada toma una conexión en exclusiva (ServerProxy no es thread-safe) y la devuelve
+    al terminar, de modo que las llamadas consecutivas reutilizan la conexión TCP/TLS en lugar
+    de abrir una nueva. Como máximo hay `size` conexiones abiertas; si todas están en uso, la
+    llamada espera a que quede una libre. Al reutilizar una conexión se descarta si lleva más
+    de `idle_timeout` segundos ociosa o si el servidor la ha cerrado, y las conexiones que fallan
+    con un error distinto de un Fault de Odoo (red, protocolo) no vuelven al pool.
+    """
+
+    def __init__(self, url: str, protocol: str, service: str, size: int, idle_timeout: float, timeout: float = None):
+        self.url = url
+        self.protocol = protocol
+        self.service = service
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # (última vez usada, transporte, proxy); la más reciente al final
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _connect(self):
+        self.created += 1
+        return rpc_connect(self.url, self.protocol, self.service, self.timeout)
+
+    def _checkout(self):
+        now = time.monotonic()
+        with self._lock:
+            self.in_use += 1
+            while self._idle:
+                last_used, transport, proxy = self._idle.pop()
+                if now - last_used <= self.idle_timeout and transport.is_alive():
+                    self.reused += 1
+                    return transport, proxy
+                transport.close()
+                self.discarded += 1
+            return self._connect()
+
+    def _checkin(self, transport, proxy, healthy: bool):
+        with self._lock:
+            self.in_use -= 1
+            if healthy:
+                self._idle.append((time.monotonic(), transport, proxy))
+            else:
+                transport.close()
+                self.discarded += 1
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Context manager que presta (transporte, proxy) del pool durante una llamada"""
+        self._slots.acquire()
+        try:
+            transport, proxy = self._checkout()
+            healthy = False
+            try:
+                yield transport, proxy
+                healthy = True
+            except xmlrpc.client.Fault:
+                # Error de Odoo con una respuesta completa: la conexión sigue siendo válida
+                healthy = True
+                raise
+            finally:
+                self._checkin(transport, proxy, healthy)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Cierra las conexiones ociosas"""
+        with self._lock:
+            for _, transport, _ in self._idle:
+                transport.close()
+            self._idle.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "protocol": self.protocol,
+                "size": self.size,
+                "idle_timeout_seconds": self.idle_timeout,
+                "call_timeout_seconds": self.timeout,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded
+            }
+
+# Textos de los Fault con los que Odoo rechaza las credenciales o la sesión (AccessDenied,
+# SessionExpiredException); un AccessError por permisos no cuenta
+AUTH_FAULT_MARKERS = ('AccessDenied', 'Access Denied', 'SessionExpired', 'Session expired')
+
+def is_auth_fault(error: Exception) -> bool:
+    return isinstance(error, xmlrpc.client.Fault) and any(marker in str(error.faultString) for marker in AUTH_FAULT_MARKERS)
+
+class OdooSession:
+    """
+    Sesión autenticada con Odoo: uid con caducidad (`ttl` segundos) compartido entre workers si
+    hay caché compartida.
+
+    `credentials()` devuelve (uid, clave API) autenticando solo si no hay sesión o ha caducado;
+    `renew(since)` reautentica tras un fallo de autenticación de una llamada iniciada en `since`
+    salvo que otra llamada ya lo haya hecho después. En ambos casos autentica un solo hilo (y un
+    solo worker) y el resto espera y reutiliza su uid. La clave se relee de ODOO_API_KEY_FILE en
+    cada autenticación, de modo que una clave rotada se aplica sin reiniciar.
+    """
+
+    def __init__(self, url: str, db: str, username: str, api_key: str, protocol: str,
+                 shared: SharedCache = None, ttl: float = 3600, lock_timeout: float = 30, timeout: float = None):
+        self.url = url
+        self.timeout = timeout
+        self.db = db
+        self.username = username
+        self.api_key = api_key
+        self.api_key_file = os.getenv('ODOO_API_KEY_FILE')
+        self.protocol = protocol
+        self.shared = shared
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.uid = None
+        self.authenticated_at = 0.0  # time.time() de la autenticación del uid actual
+        self._lock = threading.Lock()
+        self._shared_key = f"uid:{url}:{db}:{username}"
+        self.authentications = 0
+        self.renewals = 0
+        self.shared_reuses = 0
+        self.last_error = None
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.uid) and time.time() - self.authenticated_at < self.ttl
+
+    def credentials(self):
+        if not self.valid:
+            with self._lock:
+                if not self.valid:
+                    self._acquire(since=0)
+        return self.uid, self.api_key
+
+    def renew(self, since: float):
+        """Reautentica si nadie lo ha hecho desde `since` (inicio de la llamada rechazada)"""
+        with self._lock:
+            if self.uid and self.authenticated_at > since:
+                return self.uid
+            self.renewals += 1
+            logger.warning("🔑 Odoo rejected the session, re-authenticating")
+            return self._acquire(since)
+
+    def _acquire(self, since: float):
+        if self.shared is None:
+            return self.authenticate()
+
+        def lookup():
+            state = self.shared.get_state(self._shared_key)
+            if not state:
+                return False, None
+            state = json.loads(state)
+            # Solo vale un uid vigente y obtenido después de la llamada rechazada
+            if state['authenticated_at'] <= since or time.time() - state['authenticated_at'] >= self.ttl:
+                return False, None
+            return True, state
+
+        authenticated = False
+
+        def authenticate():
+            nonlocal authenticated
+            authenticated = True
+            return self.authenticate()
+
+        try:
+            loaded, state = self.shared.once(f"auth:{shared_key(self._shared_key)}", authenticate, lookup, self.lock_timeout)
+        except Exception as e:
+            if authenticated:
+                raise
+            logger.warning(f"⚠️  Shared session unavailable, authenticating directly: {e}")
+            return self.authenticate()
+        if not loaded:
+            self.uid, self.authenticated_at = state['uid'], state['authenticated_at']
+            self._reload_api_key()
+            self.shared_reuses += 1
+            logger.info(f"✅ Reusing shared Odoo session - UID: {self.uid}")
+        return self.uid
+
+    def _reload_api_key(self):
+        if self.api_key_file:
+            with open(self.api_key_file) as f:
+                self.api_key = f.read().strip()
+
+    def authenticate(self):
+        self._reload_api_key()
+        try:
+            transport, common = rpc_connect(self.url, self.protocol, 'common', self.timeout)
+            try:
+                uid = common.authenticate(self.db, self.username, self.api_key, {})
+            finally:
+                transport.close()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"❌ Authentication failed: {e}")
+            raise
+        self.authentications += 1
+        if not uid:
+            self.uid = None
+            self.last_error = f"Odoo rejected the credentials of {self.username} on database {self.db}"
+            logger.error(f"❌ Authentication failed: Odoo rejected the credentials of {self.username}")
+            raise PermissionError(self.last_error)
+        self.uid, self.authenticated_at = uid, time.time()
+        self.last_error = None
+        logger.info(f"✅ Authenticated with Odoo - UID: {self.uid}")
+        if self.shared is not None:
+            try:
+                self.shared.set_state(self._shared_key, json.dumps({"uid": uid, "authenticated_at": self.authenticated_at}))
+            except Exception as e:
+                logger.warning(f"⚠️  Could not publish UID to the shared cache: {e}")
+        return self.uid
+
+    def stats(self):
+        return {
+            "uid": self.uid,
+            "valid": self.valid,
+            "ttl_seconds": self.ttl,
+            "age_seconds": round(time.time() - self.authenticated_at, 1) if self.uid else None,
+            "expires_in_seconds": round(max(0.0, self.authenticated_at + self.ttl - time.time()), 1) if self.uid else None,
+            "last_error": self.last_error,
+            "authentications": self.authentications,
+            "renewals": self.renewals,
+            "shared_reuses": self.shared_reuses
+        }
+
+# Fault con los que Odoo rechaza la agrupación o la agregación pedida a read_group (campo no
+# almacenado, función o granularidad no admitida); un dominio inválido ("... in leaf") no cuenta
+READ_GROUP_UNSUPPORTED_MARKERS = ('Invalid field', 'Invalid aggregate', 'Invalid aggregation', 'Invalid groupby',
+                                  'Invalid granularity', 'cannot be grouped', 'is not stored', 'not supported')
+
+def is_unsupported_grouping(error: xmlrpc.client.Fault) -> bool:
+    text = str(error.faultString)
+    return 'in leaf' not in text and any(marker in text for marker in READ_GROUP_UNSUPPORTED_MARKERS)
+
+class OdooUnavailable(Exception):
+    """Odoo no responde: fallos transitorios tras agotar los reintentos o cortocircuito abierto"""
+
+# Fault de Odoo que se resuelven repitiendo la llamada (conflictos de concurrencia en PostgreSQL)
+TRANSIENT_FAULT_MARKERS = ('could not serialize access', 'concurrent update', 'TransactionRollbackError',
+                           'SerializationFailure', 'deadlock detected')
+# Códigos HTTP de un proxy o de Odoo sobrecargado o reiniciándose
+TRANSIENT_HTTP_CODES = (408, 429, 502, 503, 504)
+
+def is_transient_error(error: Exception) -> bool:
+    """Errores que pueden desaparecer al repetir la llamada: red, tiempos de espera, HTTP 5xx de proxy"""
+    if isinstance(error, xmlrpc.client.Fault):
+        return any(marker in str(error.faultString) for marker in TRANSIENT_FAULT_MARKERS)
+    if isinstance(error, xmlrpc.client.ProtocolError):
+        return error.errcode in TRANSIENT_HTTP_CODES
+    # Solo fallos de transporte: otros OSError (PermissionError por credenciales rechazadas,
+    # FileNotFoundError de ODOO_API_KEY_FILE) no se arreglan repitiendo la llamada
+    return isinstance(error, (ConnectionError, TimeoutError, socket.timeout, socket.gaierror, http.client.HTTPException))
+
+class CircuitBreaker:
+    """
+    Cortocircuito de las llamadas a Odoo. Tras `threshold` fallos transitorios seguidos se abre y
+    las llamadas fallan al instante (OdooUnavailable) durante `cooldown` segundos, sin cargar más
+    a un Odoo que ya tiene problemas. Pasado ese tiempo deja pasar una llamada de prueba
+    (semiabierto): si Odoo responde se cierra y si falla vuelve a abrirse.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Lanza OdooUnavailable si el circuito está abierto (o ya hay una llamada de prueba en curso)"""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            raise OdooUnavailable(f"Odoo is unavailable (circuit open after {self.failures} consecutive failures, "
+                                  f"last: {self.last_error}); retrying in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("✅ Odoo is responding again, circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)[:200]
+            self._probing = False
+            if self.threshold > 0 and (self.state == 'half_open' or self.failures >= self.threshold):
+                if self.state != 'open':
+                    self.times_opened += 1
+                    logger.error(f"🔌 Circuit opened after {self.failures} consecutive Odoo failures: {self.last_error}")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.threshold > 0,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.threshold,
+                "cooldown_seconds": self.cooldown,
+                "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.state != 'closed' else None,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected,
+                "last_error": self.last_error
+            }
+
 class OdooConnector:
     def __init__(self):
         self.url = os.getenv('ODOO_URL')
         self.db = os.getenv('ODOO_DB')
         self.username = os.getenv('ODOO_USERNAME')
-        self.api_key = os.getenv('ODOO_API_KEY')
-        self.uid = None
-        self.models = None
-        logger.info(f"🔧 Initializing Odoo connector for {self.url}")
+        # Pool acotado de hilos para las llamadas XML-RPC bloqueantes
+        self.max_workers = int(os.getenv('ODOO_MAX_WORKERS', '8'))
+        # Tamaño de lote para recorrer search_read paginado
+        self.page_size = int(os.getenv('ODOO_PAGE_SIZE', '2000'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='odoo-rpc')
+        # Protocolo de las llamadas a Odoo: xmlrpc (/xmlrpc/2/...) o jsonrpc (/jsonrpc)
+        self.protocol = os.getenv('ODOO_RPC_PROTOCOL', 'xmlrpc').lower()
+        if self.protocol not in RPC_PROTOCOLS:
+            raise ValueError(f"ODOO_RPC_PROTOCOL must be one of {', '.join(RPC_PROTOCOLS)}, got {self.protocol!r}")
+        # Tiempo máximo de espera de cada llamada a Odoo (0 = sin límite)
+        call_timeout = float(os.getenv('ODOO_CALL_TIMEOUT', '120')) or None
+        # Conexiones persistentes al servicio 'object' compartidas por los hilos del pool
+        self.pool = RpcConnectionPool(
+            self.url, self.protocol, 'object',
+            size=int(os.getenv('ODOO_POOL_SIZE', str(self.max_workers))),
+            idle_timeout=float(os.getenv('ODOO_POOL_IDLE_TIMEOUT', '60')),
+            timeout=call_timeout
+        )
+        # Reintentos de lecturas con errores transitorios: espera aleatoria entre 0 y
+        # min(retry_max_delay, retry_backoff * 2^intento) antes de cada reintento
+        self.retry_attempts = int(os.getenv('ODOO_RETRY_ATTEMPTS', '3'))
+        self.retry_backoff = float(os.getenv('ODOO_RETRY_BACKOFF', '0.5'))
+        self.retry_max_delay = float(os.getenv('ODOO_RETRY_MAX_DELAY', '8'))
+        self.breaker = CircuitBreaker(
+            threshold=int(os.getenv('ODOO_BREAKER_THRESHOLD', '5')),
+            cooldown=float(os.getenv('ODOO_BREAKER_COOLDOWN', '30'))
+        )
+        # Agrupaciones que Odoo no acepta en read_group (se agregan en Python)
+        self._read_group_unsupported = set()
+        # Réplica local de los modelos de ventas (OdooReplica), si la sincronización está activada
+        self.replica = None
+        # Caché y sesión comunes a los workers; con varios workers (WEB_CONCURRENCY) y sin
+        # ODOO_SHARED_CACHE se usa un fichero SQLite local
+        shared_url = os.getenv('ODOO_SHARED_CACHE', '')
+        if not shared_url and int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+            shared_url = 'sqlite:///tmp/odoo_mcp_shared.sqlite3'
+        self.shared = open_shared_cache(shared_url) if shared_url and shared_url != 'off' else None
+        lock_timeout = float(os.getenv('ODOO_SHARED_LOCK_TIMEOUT', '30'))
+        # uid autenticado, compartido entre workers y renovado al caducar o si Odoo lo rechaza
+        self.session = OdooSession(
+            self.url, self.db, self.username, os.getenv('ODOO_API_KEY'), self.protocol,
+            shared=self.shared,
+            ttl=float(os.getenv('ODOO_SESSION_TTL', '3600')),
+            lock_timeout=lock_timeout,
+            timeout=call_timeout
+        )
+        self.cache = QueryCache(
+            ttl=float(os.getenv('ODOO_CACHE_TTL', '60')),
+            max_entries=int(os.getenv('ODOO_CACHE_MAX_ENTRIES', '512')),
+            max_bytes=int(float(os.getenv('ODOO_CACHE_MAX_MB', '128')) * 1024 * 1024),
+            stale_ttl=float(os.getenv('ODOO_CACHE_STALE_TTL', '3600')),
+            shared=self.shared,
+            lock_timeout=lock_timeout
+        )
+        logger.info(f"🔧 Initializing Odoo connector for {self.url} ({self.protocol}, {self.max_workers} workers)")
+        if self.shared is not None:
+            logger.info(f"🤝 Sharing cache and session across processes ({self.shared.backend})")
+
+    @property
+    def uid(self):
+        return self.session.uid
 
     def authenticate(self):
+        return self.session.authenticate()
+
+    def ensure_authenticated(self):
+        return self.session.credentials()[0]
+
+    def open_connections(self, count: int = None) -> int:
+        """Abre `count` conexiones del pool (por defecto todas) con una llamada ligera en cada una"""
+        count = count or self.pool.size
+        with contextlib.ExitStack() as stack:
+            connections = [stack.enter_context(self.pool.connection()) for _ in range(count)]
+            for _, models in connections:
+                uid, api_key = self.session.credentials()
+                models.execute_kw(self.db, uid, api_key, 'res.users', 'search_count', [[['id', '=', uid]]], {})
+        return count
+
+    def _local_sources(self):
+        """Datos en memoria que pueden responder sin ir a Odoo: instantánea de la petición y réplica local"""
+        snapshot = request_snapshot.get()
+        if snapshot is not None:
+            yield snapshot
+        if self.replica is not None:
+            mirror = self.replica.current()
+            if mirror is not None:
+                yield mirror
+
+    def execute_kw(self, model: str, method: str, args: list, kwargs: dict = None):
+        cancelled = call_cancelled.get()
+        if cancelled is not None and cancelled.is_set():
+            # Nadie espera ya el resultado (petición cancelada o sección fuera de tiempo)
+            raise asyncio.CancelledError(f"{model}.{method} abandoned")
+        kwargs = kwargs or {}
+        trace = request_trace.get()
+        if trace is None:
+            return self._resolve(model, method, args, kwargs)[1]
+        start = time.perf_counter()
         try:
-            common = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/common')
-            self.uid = common.authenticate(self.db, self.username, self.api_key, {})
-            self.models = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/object')
-            logger.info(f"✅ Authenticated with Odoo - UID: {self.uid}")
-            return self.uid
+            source, result = self._resolve(model, method, args, kwargs)
         except Exception as e:
-            logger.error(f"❌ Authentication failed: {e}")
+            trace.add_call(model, method, args, None, start, 'odoo', error=str(e))
             raise
-
-    def execute_kw(self, model: str, method: str, args: list, kwargs: dict = None):
-        if not self.uid:
-            self.authenticate()
+        trace.add_call(model, method, args, result, start, source)
+        return result
+
+    def _resolve(self, model: str, method: str, args: list, kwargs: dict):
+        """(origen, resultado) de execute_kw: datos locales, caché o una llamada a Odoo"""
+        for source in self._local_sources():
+            handled, result = source.answer(model, method, args, kwargs)
+            if handled:
+                LOCAL_ANSWERS.inc(model=model, method=method)
+                return 'local', result
+
+        if method in CACHEABLE_METHODS and self.cache.enabled:
+            key = self.cache.make_key(model, method, args, kwargs)
+            refresh = cache_refresh.get()
+            if not refresh:
+                hit, result = self.cache.get(key, model)
+                stats = request_cache_stats.get()
+                if stats is not None:
+                    stats['hits' if hit else 'misses'] += 1
+                CACHE_LOOKUPS.inc(model=model, method=method, result='hit' if hit else 'miss')
+                if hit:
+                    logger.info(f"⚡ Cache hit {model}.{method}")
+                    return 'cache', result
+            # Con caché compartida, otro worker puede estar pidiendo lo mismo a Odoo: se espera su resultado
+            try:
+                loaded, result = self.cache.load(key, model, lambda: self._execute_kw(model, method, args, kwargs),
+                                                 refresh=refresh)
+            except OdooUnavailable:
+                # Odoo caído o cortocircuito abierto: mejor el último resultado conocido que un error
+                found, result = self.cache.get_stale(key)
+                if not found:
+                    raise
+                stats = request_cache_stats.get()
+                if stats is not None:
+                    stats['stale'] = stats.get('stale', 0) + 1
+                CACHE_LOOKUPS.inc(model=model, method=method, result='stale')
+                logger.warning(f"♻️  Odoo unavailable, serving stale cached {model}.{method}")
+                return 'stale', result
+            return ('odoo' if loaded else 'cache'), result
+
+        result = self._execute_kw(model, method, args, kwargs)
+        if method not in CACHEABLE_METHODS:
+            # Cualquier escritura deja obsoletas las lecturas cacheadas del modelo
+            self.cache.invalidate(model)
+        return 'odoo', result
+
+    def _execute_kw(self, model: str, method: str, args: list, kwargs: dict):
+        start = time.perf_counter()
+        ODOO_CALLS_IN_FLIGHT.inc()
         try:
-            result = self.models.execute_kw(
-                self.db, self.uid, self.api_key,
-                model, method, args, kwargs or {}
-            )
-            logger.info(f"📊 Executed {model}.{method} - Returned {len(result) if isinstance(result, list) else 1} records")
+            result, response_bytes = self._call_resilient(model, method, args, kwargs)
+            records = len(result) if isinstance(result, list) else 1
+            ODOO_CALL_RECORDS.observe(records, model=model, method=method)
+            ODOO_CALL_BYTES.observe(response_bytes, model=model, method=method)
+            logger.info(f"📊 Executed {model}.{method} - Returned {records} records")
             return result
         except Exception as e:
+            kind = 'fault' if isinstance(e, xmlrpc.client.Fault) else ('unavailable' if isinstance(e, OdooUnavailable) else 'error')
+            ODOO_CALL_ERRORS.inc(model=model, method=method, kind=kind)
             logger.error(f"❌ Error executing {model}.{method}: {e}")
             raise
+        finally:
+            ODOO_CALLS_IN_FLIGHT.dec()
+            ODOO_CALL_SECONDS.observe(time.perf_counter() - start, model=model, method=method)
+
+    def _call_resilient(self, model: str, method: str, args: list, kwargs: dict):
+        """
+        _call con reautenticación si Odoo rechaza la sesión, reintentos con espera exponencial
+        aleatoria de los errores transitorios (solo lecturas: repetir una escritura podría
+        duplicarla) y cortocircuito mientras Odoo no responde.
+        """
+        retries = self.retry_attempts if method in CACHEABLE_METHODS else 0
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            sent_at = time.time()
+            try:
+                try:
+                    outcome = self._call(model, method, args, kwargs)
+                except xmlrpc.client.Fault as e:
+                    if not is_auth_fault(e):
+                        raise
+                    # Sesión caducada o clave rotada: reautenticar (una sola vez para todas las
+                    # llamadas rechazadas a la vez) y repetir la llamada
+                    self.session.renew(sent_at)
+                    outcome = self._call(model, method, args, kwargs)
+            except (PermissionError, FileNotFoundError):
+                # Credenciales rechazadas o fichero de la clave ausente: error de configuración,
+                # no de disponibilidad de Odoo (ni reintento ni cuenta para el cortocircuito)
+                raise
+            except Exception as e:
+                if not is_transient_error(e):
+                    # Odoo respondió (error de negocio o de permisos): está disponible
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure(e)
+                if attempt >= retries:
+                    raise OdooUnavailable(f"Odoo unavailable after {attempt + 1} attempt(s): {type(e).__name__}: {e}") from e
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_backoff * 2 ** attempt))
+                ODOO_CALL_RETRIES.inc(model=model, method=method)
+                logger.warning(f"🔁 Transient error on {model}.{method} ({type(e).__name__}: {e}), "
+                               f"retry {attempt + 1}/{retries} in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return outcome
+
+    def _call(self, model: str, method: str, args: list, kwargs: dict):
+        """Una llamada execute_kw por una conexión del pool; devuelve (resultado, bytes de la respuesta)"""
+        uid, api_key = self.session.credentials()
+        with self.pool.connection() as (transport, models):
+            result = models.execute_kw(self.db, uid, api_key, model, method, args, kwargs)
+            return result, transport.response_bytes
+
+    def _read_page(self, model: str, domain: list, fields: list, order: str, limit: int, cursor):
+        """
+        Lee una página de search_read. Sin `order` pagina por id (keyset), estable aunque
+        se creen registros mientras se recorre; con `order` pagina por offset.
+        Devuelve (registros, cursor siguiente o None si no quedan más).
+        """
+        if order:
+            batch = self.execute_kw(model, 'search_read', [domain], {
+                'fields': fields, 'order': order, 'offset': cursor or 0, 'limit': limit
+            })
+            next_cursor = (cursor or 0) + limit
+        else:
+            batch = self.execute_kw(model, 'search_read', [domain + [['id', '>', cursor or 0]]], {
+                'fields': fields, 'order': 'id', 'limit': limit
+            })
+            next_cursor = batch[-1]['id'] if batch else None
+        return batch, (next_cursor if len(batch) == limit else None)
+
+    def search_read_iter(self, model: str, domain: list, fields: list, order: str = None, batch_size: int = None):
+        """Generador que recorre todos los registros de search_read en lotes de `batch_size`"""
+        batch_size = batch_size or self.page_size
+        cursor = None
+        while True:
+            batch, cursor = self._read_page(model, domain, fields, order, batch_size, cursor)
+            yield from batch
+            if cursor is None:
+                return
+
+    async def search_read_stream(self, model: str, domain: list, fields: list, order: str = None, batch_size: int = None):
+        """Versión async de search_read_iter: cada lote se pide en el pool de hilos"""
+        batch_size = batch_size or self.page_size
+        cursor = None
+        while True:
+            batch, cursor = await self.run_async(self._read_page, model, domain, fields, order, batch_size, cursor)
+            for record in batch:
+                yield record
+            if cursor is None:
+                return
+
+    async def search_read_all(self, model: str, domain: list, fields: list, order: str = None):
+        """Lee todos los registros que cumplen el dominio, paginando internamente"""
+        return [record async for record in self.search_read_stream(model, domain, fields, order)]
+
+    def read_group(self, model: str, domain: list, groupby: list, aggregates: dict):
+        """
+        Agrega en el servidor con read_group. `aggregates` es {alias: (campo, 'sum'|'max'|'min')}.
+
+        Devuelve una fila por grupo con el valor de cada campo de `groupby` (admite
+        'campo:day' y 'campo:month' como cubos de fecha 'YYYY-MM-DD'), '__count' y cada alias.
+        Si Odoo rechaza la agrupación, descarga las filas y agrega en Python.
+        """
+        trace = request_trace.get()
+        start = time.perf_counter()
+        if self.replica is not None and self.replica.current() is not None:
+            # Sumas por rango de fechas resueltas con los agregados materializados de la réplica
+            groups = self.replica.aggregates.read_group(model, domain, groupby, aggregates)
+            if groups is not None:
+                LOCAL_ANSWERS.inc(model=model, method='read_group')
+                if trace is not None:
+                    trace.add_call(model, 'read_group', [domain], groups, start, 'aggregates')
+                return groups
+
+        fields = {gb.split(':')[0] for gb in groupby} | {field for field, _ in aggregates.values()}
+        for source in self._local_sources():
+            records = source.select(model, domain, fields)
+            if records is not None:
+                LOCAL_ANSWERS.inc(model=model, method='read_group')
+                groups = self.aggregate_records(records, groupby, aggregates)
+                if trace is not None:
+                    trace.add_call(model, 'read_group', [domain], groups, start, 'local')
+                return groups
+
+        key = (model, tuple(groupby))
+        if key not in self._read_group_unsupported:
+            fields = [f'{alias}:{func}({field})' for alias, (field, func) in aggregates.items()]
+            try:
+                groups = self.execute_kw(model, 'read_group', [domain, fields, groupby], {'lazy': False})
+            except xmlrpc.client.Fault as e:
+                # Solo una agrupación que Odoo no admite se resuelve en Python (para siempre); permisos,
+                # dominios inválidos u otros errores se propagan
+                if not is_unsupported_grouping(e):
+                    raise
+                logger.warning(f"⚠️  read_group on {model} by {groupby} not available, aggregating rows locally: {e.faultString[:200]}")
+                self._read_group_unsupported.add(key)
+            else:
+                return [self._normalize_group(group, groupby, aggregates) for group in groups]
+        return self._aggregate_rows(model, domain, groupby, aggregates)
+
+    @staticmethod
+    def _normalize_group(group: dict, groupby: list, aggregates: dict):
+        row = {}
+        for gb in groupby:
+            if ':' in gb:
+                # Odoo devuelve una etiqueta localizada; el inicio del rango es la clave estable
+                bucket_range = (group.get('__range') or {}).get(gb) or {}
+                row[gb] = bucket_range['from'][:10] if bucket_range.get('from') else group.get(gb)
+            else:
+                row[gb] = group.get(gb)
+        row['__count'] = group.get('__count', 0)
+        for alias, (_, func) in aggregates.items():
+            value = group.get(alias)
+            row[alias] = (value or 0) if func == 'sum' else value
+        return row
+
+    @staticmethod
+    def _bucket(value, granularity: str):
+        if not value:
+            return False
+        if granularity == 'month':
+            return value[:7] + '-01'
+        return value[:10]
+
+    def _aggregate_rows(self, model: str, domain: list, groupby: list, aggregates: dict):
+        fields = sorted({gb.split(':')[0] for gb in groupby} | {field for field, _ in aggregates.values()})
+        return self.aggregate_records(self.search_read_iter(model, domain, fields), groupby, aggregates)
+
+    @classmethod
+    def aggregate_records(cls, records, groupby: list, aggregates: dict):
+        """Agrega en Python un iterable de registros con la misma salida que read_group"""
+        groups = {}
+        for record in records:
+            values = []
+            for gb in groupby:
+                field, _, granularity = gb.partition(':')
+                value = record.get(field)
+                values.append(cls._bucket(value, granularity) if granularity else value)
+            # Los many2one llegan como [id, nombre]: se agrupa por id
+            group_key = tuple(v[0] if isinstance(v, list) else v for v in values)
+
+            if group_key not in groups:
+                groups[group_key] = {gb: v for gb, v in zip(groupby, values)}
+                groups[group_key]['__count'] = 0
+                for alias, (_, func) in aggregates.items():
+                    groups[group_key][alias] = 0 if func == 'sum' else None
+            group = groups[group_key]
+            group['__count'] += 1
+
+            for alias, (field, func) in aggregates.items():
+                value = record.get(field)
+                if value is None or value is False:
+                    continue
+                if func == 'sum':
+                    group[alias] += value
+                elif func == 'max':
+                    group[alias] = value if group[alias] is None or value > group[alias] else group[alias]
+                elif func == 'min':
+                    group[alias] = value if group[alias] is None or value < group[alias] else group[alias]
+
+        return list(groups.values())
+
+    async def run_async(self, func, *args, **kwargs):
+        """Ejecuta una función bloqueante en el pool de hilos del conector sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        # Propagar el contexto (caché e instantánea de la petición) al hilo del pool
+        context = contextvars.copy_context()
+        cancelled = threading.Event()
+        context.run(call_cancelled.set, cancelled)
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+        except asyncio.CancelledError:
+            # El hilo no se puede interrumpir, pero no hará más llamadas a Odoo (ver execute_kw)
+            cancelled.set()
+            raise
+
+    async def execute_kw_async(self, model: str, method: str, args: list, kwargs: dict = None):
+        """Versión awaitable de execute_kw para usar desde los endpoints async"""
+        return await self.run_async(self.execute_kw, model, method, args, kwargs)
+
+    async def read_group_async(self, model: str, domain: list, groupby: list, aggregates: dict):
+        """Versión awaitable de read_group"""
+        return await self.run_async(self.read_group, model, domain, groupby, aggregates)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+        if self.shared is not None:
+            self.shared.close()
 
 # Inicializar conector global
 odoo = OdooConnector()
 
+# ==================== INSTANTÁNEA DE DATOS ====================
+
+class DatasetSnapshot:
+    """
+    Tablas de Odoo cargadas una sola vez por petición y compartidas por todas sus secciones.
+
+    Cada tabla se define con un dominio (solo hojas combinadas con AND) y los campos a leer,
+    y se carga de forma perezosa la primera vez que se necesita. Mientras la instantánea está
+    activa (request_snapshot), execute_kw y read_group responden en memoria cualquier consulta
+    cuyo dominio implique el de la tabla y cuyos campos estén cargados; el resto va a Odoo.
+    """
+
+    # Campos many2one por los que se resuelven hojas con ruta ('order_id.date_order')
+    RELATIONS = {
+        ('sale.order', 'partner_id'): 'res.partner',
+        ('sale.order.line', 'order_id'): 'sale.order',
+        ('sale.order.line', 'order_partner_id'): 'res.partner',
+    }
+
+    # Operadores que se evalúan en memoria; las consultas con otros van a Odoo
+    OPERATORS = {'=', '!=', 'in', 'not in', '>', '>=', '<', '<='}
+
+    def __init__(self, connector: OdooConnector, tables: dict, rows: dict = None):
+        self.connector = connector
+        # model -> {'domain': [...], 'fields': set}
+        self.tables = {model: {'domain': domain, 'fields': set(fields) | {'id'}} for model, (domain, fields) in tables.items()}
+        # `rows` permite crear la instantánea con las tablas ya cargadas (réplica local)
+        self._rows = dict(rows or {})
+        self._by_id = {model: {row['id']: row for row in model_rows} for model, model_rows in self._rows.items()}
+        self._locks = {model: threading.Lock() for model in tables}
+
+    def _load(self, model: str):
+        if model in self._rows:
+            return self._rows[model]
+        with self._locks[model]:
+            if model not in self._rows:
+                table = self.tables[model]
+                # La carga se hace contra Odoo, no contra la propia instantánea
+                token = request_snapshot.set(None)
+                try:
+                    rows = list(self.connector.search_read_iter(model, table['domain'], sorted(table['fields'] - {'id'})))
+                finally:
+                    request_snapshot.reset(token)
+                self._by_id[model] = {row['id']: row for row in rows}
+                self._rows[model] = rows
+                logger.info(f"📸 Snapshot loaded {model} - {len(rows)} records")
+        return self._rows[model]
+
+    @classmethod
+    def _implies(cls, query_leaf, table_leaf):
+        """True si la hoja de la consulta garantiza la condición de la hoja de la tabla"""
+        (field, op, value), (t_field, t_op, t_value) = query_leaf, table_leaf
+        if field != t_field:
+            return False
+        if op == t_op and value == t_value:
+            return True
+        try:
+            if op in ('=', 'in'):
+                # Todos los valores que admite la consulta deben cumplir la condición de la tabla
+                values = list(value) if op == 'in' else [value]
+                return all(cls._match(v, t_op, t_value) for v in values)
+            if op in ('>', '>=') and t_op in ('>', '>='):
+                return value > t_value or (value == t_value and (t_op == '>=' or op == '>'))
+            if op in ('<', '<=') and t_op in ('<', '<='):
+                return value < t_value or (value == t_value and (t_op == '<=' or op == '<'))
+        except TypeError:
+            return False
+        return False
+
+    def _resolvable(self, model: str, field: str):
+        head, _, rest = field.partition('.')
+        if head not in self.tables[model]['fields']:
+            return False
+        if not rest:
+            return True
+        related = self.RELATIONS.get((model, head))
+        return related in self.tables and self._resolvable(related, rest)
+
+    def covers(self, model: str, domain: list, fields) -> bool:
+        table = self.tables.get(model)
+        if table is None or not isinstance(domain, list):
+            return False
+        if not all(isinstance(leaf, (list, tuple)) and len(leaf) == 3 and leaf[1] in self.OPERATORS for leaf in domain):
+            return False
+        if not set(fields) <= table['fields']:
+            return False
+        if not all(self._resolvable(model, leaf[0]) for leaf in domain):
+            return False
+        return all(any(self._implies(list(leaf), t_leaf) for leaf in domain) for t_leaf in table['domain'])
+
+    def _value(self, model: str, record: dict, field: str):
+        head, _, rest = field.partition('.')
+        value = record.get(head, False)
+        if not rest:
+            return value
+        related = self.RELATIONS[(model, head)]
+        related_record = self._by_id[related].get(value[0]) if value else None
+        # Un registro relacionado fuera de la tabla no cumple su dominio: sus campos cuentan como vacíos
+        return self._value(related, related_record, rest) if related_record else False
+
+    @staticmethod
+    def _match(value, op: str, target):
+        # Los many2one se comparan por id; los many2many (lista de ids) coinciden si alguno coincide
+        if isinstance(value, list) and len(value) == 2 and isinstance(value[1], str):
+            value = value[0]
+        if isinstance(value, list):
+            if op == 'in':
+                return any(v in target for v in value)
+            if op == 'not in':
+                return not any(v in target for v in value)
+            if op in ('=', '!='):
+                return (target in value) == (op == '=')
+            return False
+        if op == '=':
+            return value == target
+        if op == '!=':
+            return value != target
+        if op == 'in':
+            return value in target
+        if op == 'not in':
+            return value not in target
+        if value is False or value is None:
+            return False
+        if isinstance(target, str) and len(target) == 10 and isinstance(value, str) and len(value) == 19:
+            # Como en Odoo, una fecha comparada con un datetime abarca el día completo
+            target += ' 23:59:59' if op in ('>', '<=') else ' 00:00:00'
+        if op == '>':
+            return value > target
+        if op == '>=':
+            return value >= target
+        if op == '<':
+            return value < target
+        if op == '<=':
+            return value <= target
+        raise ValueError(f"Unsupported operator in snapshot domain: {op}")
+
+    def select(self, model: str, domain: list, fields):
+        """Registros de la tabla que cumplen el dominio, o None si la instantánea no cubre la consulta"""
+        if not self.covers(model, domain, fields):
+            return None
+        rows = self._load(model)
+        # Las hojas idénticas a las del dominio de la tabla ya se cumplen en todas las filas
+        leaves = [list(leaf) for leaf in domain if list(leaf) not in self.tables[model]['domain']]
+        for leaf in leaves:
+            related = self.RELATIONS.get((model, leaf[0].partition('.')[0]))
+            if '.' in leaf[0] and related:
+                self._load(related)
+        if not leaves:
+            return rows
+        return [row for row in rows if all(self._match(self._value(model, row, f), op, v) for f, op, v in leaves)]
+
+    def answer(self, model: str, method: str, args: list, kwargs: dict):
+        """Responde search_read / search_count desde memoria. Devuelve (resuelta, resultado)"""
+        if method not in ('search_read', 'search_count'):
+            return False, None
+        domain = args[0] if args else kwargs.get('domain', [])
+        fields = kwargs.get('fields') or [] if method == 'search_read' else []
+        if method == 'search_read' and not fields:
+            # Sin lista de campos Odoo devuelve todos: la instantánea no los tiene
+            return False, None
+        records = self.select(model, domain, fields)
+        if records is None:
+            return False, None
+        if method == 'search_count':
+            return True, len(records)
+
+        if kwargs.get('order'):
+            records = list(records)
+            for part in reversed(kwargs['order'].split(',')):
+                name, _, direction = part.strip().partition(' ')
+                records.sort(key=lambda r: (r.get(name) is False, r.get(name) or 0), reverse=direction.strip().lower() == 'desc')
+        offset = kwargs.get('offset') or 0
+        limit = kwargs.get('limit')
+        records = records[offset:offset + limit] if limit else records[offset:]
+        return True, [{'id': r['id'], **{f: r.get(f, False) for f in fields}} for r in records]
+
+def comprehensive_snapshot(days_back: int) -> DatasetSnapshot:
+    """Instantánea con los clientes, pedidos confirmados y líneas del período que usan los análisis"""
+    date_from = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+    return DatasetSnapshot(odoo, {
+        'res.partner': ([['customer_rank', '>', 0]], [
+            'name', 'email', 'phone', 'mobile', 'street', 'street2', 'city', 'state_id', 'zip',
+            'country_id', 'vat', 'create_date', 'ref', 'customer_rank', 'category_id']),
+        'sale.order': ([['state', 'in', ['sale', 'done']]], [
+            'partner_id', 'user_id', 'amount_total', 'date_order', 'state']),
+        'sale.order.line': ([['order_id.state', 'in', ['sale', 'done']], ['order_id.date_order', '>=', date_from]], [
+            'order_id', 'order_partner_id', 'product_id', 'product_uom_qty', 'price_subtotal']),
+    })
+
+# ==================== RÉPLICA LOCAL ====================
+
+class OdooReplica:
+    """
+    Copia local de pedidos, líneas de pedido y clientes, sincronizada en segundo plano.
+
+    Cada sincronización pide a Odoo solo los registros modificados desde la última
+    (write_date posterior a la marca de agua), los guarda en el LocalStore y elimina los que
+    ya no existen en Odoo. Mientras la última sincronización completa tenga menos de
+    `max_staleness` segundos, execute_kw y read_group responden desde la réplica (con la
+    misma lógica que DatasetSnapshot) las consultas que cubre; si no, se consulta Odoo.
+
+    Tras cada sincronización se actualizan con los cambios los agregados materializados
+    por día (SalesAggregates), que responden los read_group de sumas por rangos de fechas.
+
+    Con varios workers y caché compartida, solo sincroniza con Odoo el que tiene el cerrojo
+    `LEADER_LOCK` (renovado en cada ciclo); el resto relee del LocalStore lo que ese worker ha
+    escrito (`reload`), sin consultar Odoo. Si el que sincroniza se detiene, su cerrojo caduca
+    y otro worker toma el relevo.
+
+    Los nombres de los many2one (partner_id, user_id...) son los del momento en que se
+    modificó el registro que los referencia.
+    """
+
+    LEADER_LOCK = 'replica_sync'
+
+    MODELS = {
+        'res.partner': [
+            'name', 'email', 'phone', 'mobile', 'street', 'street2', 'city', 'state_id', 'zip',
+            'country_id', 'vat', 'create_date', 'ref', 'customer_rank', 'category_id'],
+        'sale.order': [
+            'name', 'partner_id', 'date_order', 'amount_total', 'state', 'user_id', 'team_id'],
+        'sale.order.line': [
+            'order_id', 'order_partner_id', 'product_id', 'product_uom_qty', 'price_subtotal'],
+    }
+
+    def __init__(self, connector: OdooConnector, store: LocalStore, interval: float, max_staleness: float):
+        self.connector = connector
+        self.store = store
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._sync_lock = threading.Lock()
+        self._snapshot = None
+        self._state = {}
+        self._records = {}
+        for model, fields in self.MODELS.items():
+            self._state[model] = store.prepare(model, self._fields(model))
+            self._records[model] = {record['id']: record for record in store.load(model)}
+        self.aggregates = SalesAggregates()
+        self.aggregates.apply(orders=self._records['sale.order'].values(), lines=self._records['sale.order.line'].values())
+        self.syncs = 0
+        self.reloads = 0
+        self.leader = False
+        # Vigencia del cerrojo de sincronización: se renueva al empezar cada ciclo y durante la sincronización
+        self.lease_ttl = interval * 2 + 10
+        self.last_error = None
+        if self.synced_at is not None:
+            # Réplica persistida por un arranque anterior: se sirve mientras no caduque
+            self._publish()
+
+    def _fields(self, model: str):
+        return sorted(set(self.MODELS[model]) | {'write_date'})
+
+    @property
+    def synced_at(self):
+        """Momento de inicio de la sincronización completa más antigua de los modelos replicados"""
+        times = [state['synced_at'] for state in self._state.values()]
+        return None if None in times else min(times)
+
+    def current(self):
+        """Instantánea de la réplica si está dentro de la antigüedad máxima, o None"""
+        snapshot = self._snapshot
+        if snapshot is None or time.time() - self.synced_at > self.max_staleness:
+            return None
+        return snapshot
+
+    def _changes(self, model: str, watermark):
+        """Lotes de registros modificados tras la marca de agua, ordenados por (write_date, id)"""
+        while True:
+            domain = []
+            if watermark:
+                write_date, record_id = watermark
+                domain = ['|', ['write_date', '>', write_date],
+                          '&', ['write_date', '=', write_date], ['id', '>', record_id]]
+            # Directo a Odoo: ni la caché ni la propia réplica deben responder a la sincronización
+            batch = self.connector._execute_kw(model, 'search_read', [domain], {
+                'fields': self._fields(model), 'order': 'write_date, id', 'limit': self.connector.page_size
+            })
+            if batch:
+                watermark = (batch[-1]['write_date'], batch[-1]['id'])
+                yield batch, watermark
+            if len(batch) < self.connector.page_size:
+                return
+
+    def _sync_model(self, model: str, changed: list, removed: list):
+        """Sincroniza un modelo añadiendo a `changed` y `removed` los registros modificados y los ids borrados"""
+        state = self._state[model]
+        records = self._records[model]
+        started = time.time()
+        for batch, watermark in self._changes(model, state['watermark']):
+            self.store.upsert(model, batch, watermark)
+            for record in batch:
+                records[record['id']] = record
+            state['watermark'] = watermark
+            changed.extend(batch)
+
+        # Los borrados no cambian write_date: se detectan comparando los ids
+        live_ids = set(self.connector._execute_kw(model, 'search', [[]], {}))
+        removed.extend(record_id for record_id in records if record_id not in live_ids)
+        if removed:
+            self.store.delete(model, removed)
+            for record_id in removed:
+                del records[record_id]
+
+        self.store.mark_synced(model, started)
+        state['synced_at'] = started
+        logger.info(f"🔄 Synced {model} - {len(changed)} changed, {len(removed)} removed, {len(records)} total")
+
+    def _publish(self):
+        rows = {model: sorted(records.values(), key=lambda r: r['id']) for model, records in self._records.items()}
+        tables = {model: ([], self._fields(model)) for model in self.MODELS}
+        self._snapshot = DatasetSnapshot(self.connector, tables, rows=rows)
+
+    def sync(self):
+        """Sincronización incremental de todos los modelos replicados (bloqueante)"""
+        with self._sync_lock:
+            changes = {model: ([], []) for model in self.MODELS}
+            try:
+                for model in self.MODELS:
+                    self._sync_model(model, *changes[model])
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                # Lo ya sincronizado está en la réplica: los agregados deben reflejarlo aunque falle otro modelo
+                (orders, removed_orders), (lines, removed_lines) = changes['sale.order'], changes['sale.order.line']
+                self.aggregates.apply(orders, lines, removed_orders, removed_lines)
+            self.last_error = None
+            self.syncs += 1
+            self._publish()
+
+    def reload(self):
+        """Incorpora lo que el worker que sincroniza ha escrito en el LocalStore desde la última vez"""
+        with self._sync_lock:
+            changes = {model: ([], []) for model in self.MODELS}
+            advanced = False
+            for model in self.MODELS:
+                stored = self.store.state(model)
+                state = self._state[model]
+                if stored['synced_at'] == state['synced_at']:
+                    continue
+                advanced = True
+                changed, removed = changes[model]
+                records = self._records[model]
+                changed.extend(self.store.changed_since(model, state['watermark']))
+                for record in changed:
+                    records[record['id']] = record
+                if changed:
+                    state['watermark'] = (changed[-1]['write_date'], changed[-1]['id'])
+                live_ids = self.store.ids(model)
+                removed.extend(record_id for record_id in records if record_id not in live_ids)
+                for record_id in removed:
+                    del records[record_id]
+                state['synced_at'] = stored['synced_at']
+            if not advanced:
+                return
+            (orders, removed_orders), (lines, removed_lines) = changes['sale.order'], changes['sale.order.line']
+            self.aggregates.apply(orders, lines, removed_orders, removed_lines)
+            self.reloads += 1
+            # Hasta que se complete la primera sincronización de todos los modelos no se sirve la réplica
+            if self.synced_at is not None:
+                self._publish()
+
+    def _lead(self) -> bool:
+        """True si este worker debe sincronizar con Odoo (siempre sin caché compartida)"""
+        shared = self.connector.shared
+        if shared is None:
+            self.leader = True
+            return True
+        try:
+            leader = (self.leader and shared.renew(self.LEADER_LOCK, self.lease_ttl)) or \
+                shared.acquire(self.LEADER_LOCK, self.lease_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️  Shared cache unavailable, keeping replica sync role: {e}")
+            return self.leader
+        if leader != self.leader:
+            logger.info("🔄 This worker now syncs the replica with Odoo" if leader else
+                        "🔄 Another worker syncs the replica, reading it from the local store")
+        self.leader = leader
+        return leader
+
+    def _sync_as_leader(self):
+        with self.connector.shared.holding(self.LEADER_LOCK, self.lease_ttl):
+            self.sync()
+
+    async def run(self):
+        """Bucle de sincronización periódica (con varios workers, solo uno consulta Odoo)"""
+        while True:
+            try:
+                if not self._lead():
+                    await asyncio.to_thread(self.reload)
+                elif self.connector.shared is None:
+                    await self.connector.run_async(self.sync)
+                else:
+                    await self.connector.run_async(self._sync_as_leader)
+            except Exception as e:
+                logger.error(f"❌ Replica sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        synced_at = self.synced_at
+        return {
+            "enabled": True,
+            "store": self.store.path,
+            "interval_seconds": self.interval,
+            "max_staleness_seconds": self.max_staleness,
+            "serving": self.current() is not None,
+            "synced_at": datetime.fromtimestamp(synced_at).isoformat() if synced_at else None,
+            "leader": self.leader,
+            "syncs": self.syncs,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "records": {model: len(records) for model, records in self._records.items()},
+            "aggregates": self.aggregates.stats(),
+            "watermarks": {model: state['watermark'] for model, state in self._state.items()}
+        }
+
+# Sincronización local desactivada si ODOO_SYNC_INTERVAL es 0
+_sync_interval = float(os.getenv('ODOO_SYNC_INTERVAL', '0'))
+if _sync_interval > 0:
+    odoo.replica = OdooReplica(
+        odoo,
+        LocalStore(os.getenv('ODOO_SYNC_DB', 'odoo_replica.sqlite3')),
+        interval=_sync_interval,
+        max_staleness=float(os.getenv('ODOO_SYNC_MAX_STALENESS', '600'))
+    )
+
+@app.on_event("startup")
+async def start_replica_sync():
+    if odoo.replica is not None:
+        app.state.replica_task = asyncio.create_task(odoo.replica.run())
+
+@app.on_event("shutdown")
+def shutdown_odoo_connector():
+    for name in ('warmup_task', 'replica_task'):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    odoo.shutdown()
+    if odoo.replica is not None:
+        odoo.replica.store.close()
+
+@app.middleware("http")
+async def cache_status_header(request: Request, call_next):
+    """Indica en cabeceras si la petición se sirvió desde la caché de Odoo"""
+    stats = {'hits': 0, 'misses': 0}
+    request_cache_stats.set(stats)
+    response = await call_next(request)
+    if stats['hits'] or stats['misses']:
+        response.headers['X-Cache'] = 'HIT' if not stats['misses'] else ('MISS' if not stats['hits'] else 'PARTIAL')
+        response.headers['X-Cache-Hits'] = str(stats['hits'])
+        response.headers['X-Cache-Misses'] = str(stats['misses'])
+    if stats.get('stale'):
+        # Parte de la respuesta son datos caducados porque Odoo no respondía
+        response.headers['X-Cache-Stale'] = str(stats['stale'])
+    return response
+
 # ==================== MODELOS PYDANTIC ====================
 
 class SalesDataRequest(BaseModel):
@@ -71,29 +1704,404 @@ class SalesDataRequest(BaseModel):
     state: Optional[str] = None
     partner_ids: Optional[List[int]] = None
     min_amount: Optional[float] = None
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
 
 class CustomerInsightsRequest(BaseModel):
     segment: str = "all"  # all, vip, at_risk, new, inactive, regular
     min_purchases: Optional[int] = None
     min_revenue: Optional[float] = None
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
 
 class OpportunitiesRequest(BaseModel):
     stage: Optional[str] = None
     min_probability: Optional[int] = None
     days_inactive: Optional[int] = None
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
 
 class ProductPerformanceRequest(BaseModel):
     days_back: int = 90
     top_n: int = 20
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
 
 class CustomerSearchRequest(BaseModel):
     query: str
     limit: int = 10
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
 
 class CategoryAnalysisRequest(BaseModel):
     category_id: Optional[int] = None  # None = todas las categorías
     days_back: int = 90
     top_customers: int = 10
+    stream: bool = False  # Respuesta NDJSON (equivale a Accept: application/x-ndjson)
+    fields: Optional[List[str]] = None  # Columnas de cada registro de "data" (None = todas)
+    debug_timing: bool = False  # Adjunta la traza de llamadas a Odoo y fases de cálculo ("trace")
+
+class ComprehensiveRequest(SalesDataRequest):
+    # Secciones a calcular (None = todas); un nombre desconocido es un error de validación (422)
+    sections: Optional[List[Literal['sales', 'customers', 'opportunities', 'products', 'team', 'territorial', 'categories']]] = None
+    # `fields` se aplica a los registros de la sección "sales"
+
+class CacheFlushRequest(BaseModel):
+    model: Optional[str] = None  # None = vaciar toda la caché
+
+# ==================== ERRORES ====================
+
+def http_error(error: Exception) -> HTTPException:
+    """Error HTTP de un endpoint: 503 con Retry-After si Odoo no está disponible, 500 en otro caso"""
+    if isinstance(error, OdooUnavailable):
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(int(odoo.breaker.cooldown))})
+    return HTTPException(status_code=500, detail=str(error))
+
+# ==================== PROYECCIÓN DE CAMPOS ====================
+
+def fetch_fields(available: list, requested: Optional[List[str]], required: tuple = ()):
+    """
+    Campos a leer de Odoo: los de `available` pedidos en `requested` más los que el endpoint
+    necesita para sus cálculos (`required`). Sin proyección, todos los de `available`.
+    """
+    if not requested:
+        return available
+    # Nunca una lista vacía: Odoo devolvería todos los campos del modelo
+    return [field for field in available if field in requested or field in required] or ['id']
+
+def project(records: list, fields: Optional[List[str]]):
+    """Solo las columnas pedidas de cada registro (los nombres desconocidos se ignoran)"""
+    if not fields:
+        return records
+    return [{key: record[key] for key in fields if key in record} for record in records]
+
+# ==================== RESPUESTAS NDJSON ====================
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_stream(http_request: Optional[Request], body: BaseModel) -> bool:
+    """Modo streaming si el cuerpo trae stream=true o el cliente acepta application/x-ndjson"""
+    if getattr(body, "stream", False):
+        return True
+    return http_request is not None and NDJSON_MEDIA_TYPE in http_request.headers.get("accept", "")
+
+def ndjson_response(lines, endpoint: str) -> StreamingResponse:
+    """
+    Respuesta NDJSON a partir de un generador async de objetos, uno por línea. Las cabeceras
+    ya se han enviado al fallar a mitad: el error se comunica con una última línea
+    {"type": "error", "detail": ...}.
+    """
+    async def body():
+        try:
+            async for line in lines:
+                yield dumps_json(line) + b"\n"
+        except Exception as e:
+            logger.error(f"Error streaming {endpoint}: {e}", exc_info=True)
+            yield dumps_json({"type": "error", "detail": str(e)}) + b"\n"
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+def json_response(http_request: Optional[Request], result: dict):
+    """
+    Respuesta de un endpoint: FastJSONResponse en una petición HTTP o el dict tal cual si el
+    endpoint se llama desde otro (get_comprehensive_data combina los resultados).
+    """
+    if http_request is None:
+        return result
+    return FastJSONResponse(result)
+
+def json_or_ndjson(http_request: Optional[Request], body: BaseModel, result: dict, endpoint: str):
+    """
+    Devuelve el resultado con json_response o, en modo streaming, cada elemento de result["data"]
+    como {"type": "record", "data": ...} seguido de {"type": "summary", ...} con el resto de claves.
+    Los registros de result["data"] se reducen a las columnas de `fields` si el request las indica.
+    """
+    if getattr(body, "fields", None) and "data" in result:
+        result["data"] = project(result["data"], body.fields)
+    if not wants_stream(http_request, body):
+        return json_response(http_request, result)
+
+    async def lines():
+        for record in result["data"]:
+            yield {"type": "record", "data": record}
+        yield {"type": "summary", **{key: value for key, value in result.items() if key != "data"}}
+    return ndjson_response(lines(), endpoint)
+
+# ==================== PETICIONES IDÉNTICAS (SINGLE-FLIGHT) ====================
+
+class SingleFlight:
+    """
+    Agrupa las ejecuciones concurrentes de una misma clave: la primera lanza el cálculo y las
+    que llegan mientras está en curso esperan su resultado (o su excepción) en lugar de repetirlo.
+    Si todas las peticiones que esperan un cálculo lo abandonan, se cancela.
+    Los resultados se comparten entre peticiones: no mutarlos.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = {}  # clave -> [asyncio.Task en curso, peticiones esperándola]
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def _finished(self, key, task: asyncio.Task):
+        flight = self._flights.get(key)
+        if flight is not None and flight[0] is task:
+            del self._flights[key]
+        # Marcar la excepción como recuperada aunque todas las peticiones hayan abandonado la espera
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key, factory):
+        flight = self._flights.get(key)
+        if flight is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            flight = self._flights[key] = [task, 0]
+            task.add_done_callback(functools.partial(self._finished, key))
+        else:
+            self.followers += 1
+        task = flight[0]
+        flight[1] += 1
+        try:
+            # shield: si una petición se cancela (cliente desconectado, timeout de sección) el
+            # cálculo sigue para las demás
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if not flight[1] and not task.done():
+                # Nadie espera ya el resultado: no seguir ocupando el pool de Odoo con él. Las
+                # peticiones que lleguen después empiezan un cálculo nuevo
+                self.abandoned += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                task.cancel()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "executed": self.leaders,
+            "coalesced": self.followers,
+            "abandoned": self.abandoned
+        }
+
+single_flight = SingleFlight(enabled=os.getenv('COALESCE_REQUESTS', 'true').lower() in ('1', 'true', 'yes'))
+
+def coalesced(endpoint):
+    """
+    Decorador de endpoint: las peticiones concurrentes al mismo endpoint con el mismo cuerpo
+    (normalizado con sus valores por defecto) comparten una sola ejecución. Las respuestas
+    en streaming no se agrupan.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(request: BaseModel, http_request: Request = None):
+        # La traza de debug_timing (también la de las secciones de un get_comprehensive_data
+        # con traza) debe medir el trabajo de esta petición, no el de otra
+        if (not single_flight.enabled or wants_stream(http_request, request)
+                or getattr(request, 'debug_timing', False) or request_trace.get() is not None):
+            return await endpoint(request, http_request)
+        key = json.dumps([endpoint.__name__, request.model_dump()], sort_keys=True, default=str)
+        # Sin petición HTTP el endpoint devuelve el dict, que cada llamante envuelve a su manera
+        result = await single_flight.run(key, lambda: endpoint(request))
+        return json_response(http_request, result)
+    return wrapper
+
+def traced(endpoint):
+    """
+    Decorador de endpoint: con debug_timing=true registra una RequestTrace durante la petición,
+    la adjunta a la respuesta ("trace" en JSON; en NDJSON, una última línea {"type": "trace"})
+    y la escribe en el log como evento estructurado.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(request: BaseModel, http_request: Request = None):
+        # Las llamadas internas (secciones de get_comprehensive_data) se suman a la traza en curso
+        if not getattr(request, 'debug_timing', False) or request_trace.get() is not None:
+            return await endpoint(request, http_request)
+        trace = RequestTrace(endpoint.__name__)
+        request_trace.set(trace)
+        try:
+            if wants_stream(http_request, request):
+                response = await endpoint(request, http_request)
+                response.body_iterator = trace.stream(response.body_iterator)
+                return response
+            result = await endpoint(request)
+        except HTTPException as e:
+            trace.log(error=str(e.detail))
+            raise
+        trace.log()
+        return json_response(http_request, {**result, "trace": trace.summary()})
+    return wrapper
+
+# ==================== CONJUNTOS DE DATOS PESADOS Y PRECARGA ====================
+
+# Pedidos que cuentan como venta en todos los análisis
+CONFIRMED_ORDER = ['state', 'in', ['sale', 'done']]
+
+# Campos de cliente del informe de clientes (get_customer_insights sin proyección)
+CUSTOMER_PROFILE_FIELDS = ['name', 'email', 'phone', 'mobile', 'street', 'street2',
+                           'city', 'state_id', 'zip', 'country_id', 'vat', 'create_date', 'ref']
+
+async def fetch_geo_customers():
+    """Todos los clientes con su ubicación (análisis territorial)"""
+    return await odoo.search_read_all('res.partner', [['customer_rank', '>', 0]],
+        ['id', 'name', 'city', 'state_id', 'country_id'])
+
+async def fetch_customer_categories():
+    """Todas las categorías (etiquetas) de cliente"""
+    return await odoo.search_read_all('res.partner.category', [], ['name', 'parent_id', 'color'])
+
+def fetch_category_customers(category_ids: list):
+    """Generador async de los clientes de las categorías, con su ubicación y sus categorías"""
+    return odoo.search_read_stream('res.partner',
+        [['category_id', 'in', category_ids], ['customer_rank', '>', 0]],
+        ['id', 'name', 'city', 'state_id', 'country_id', 'category_id'])
+
+async def fetch_order_history(*domain):
+    """Histórico de pedidos confirmados agregado por cliente: importe total, nº de pedidos y último pedido"""
+    return await odoo.read_group_async('sale.order', [CONFIRMED_ORDER, *domain], ['partner_id'], {
+        'total_revenue': ('amount_total', 'sum'),
+        'last_order_date': ('date_order', 'max')
+    })
+
+async def _prefetch_customers():
+    customers = await fetch_geo_customers()
+    profiles = await odoo.search_read_all('res.partner', [['customer_rank', '>', 0]], CUSTOMER_PROFILE_FIELDS)
+    return len(customers) + len(profiles)
+
+async def _prefetch_categories():
+    categories = await fetch_customer_categories()
+    customers = [partner async for partner in fetch_category_customers([c['id'] for c in categories])]
+    return len(categories) + len(customers)
+
+async def _prefetch_order_history():
+    category_ids = [c['id'] for c in await fetch_customer_categories()]
+    groups = await fetch_order_history()
+    groups += await fetch_order_history(['partner_id.customer_rank', '>', 0])
+    groups += await fetch_order_history(['partner_id.category_id', 'in', category_ids], ['partner_id.customer_rank', '>', 0])
+    return len(groups)
+
+# Conjuntos que precarga WarmUp: nombre -> corrutina que los lee y devuelve cuántas filas leyó
+PREFETCH_DATASETS = {
+    'customers': _prefetch_customers,
+    'categories': _prefetch_categories,
+    'order_history': _prefetch_order_history,
+}
+
+class WarmUp:
+    """
+    Fase de arranque en segundo plano: autentica, abre las conexiones del pool y precarga en la
+    caché de consultas los conjuntos de datos de los informes pesados (mismas consultas, mismas
+    claves de caché). Después los vuelve a leer cada `refresh_interval` segundos sustituyendo las
+    entradas, para que las peticiones los encuentren siempre en caché. Con caché compartida,
+    solo un worker refresca en cada intervalo.
+    """
+
+    def __init__(self, connector: OdooConnector, datasets: dict, enabled: bool, refresh_interval: float):
+        self.connector = connector
+        self.datasets = datasets
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.state = 'pending' if enabled else 'disabled'
+        self.steps = {}
+        self.started_at = None
+        self.completed_at = None
+        self.refreshes = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ('ready', 'degraded', 'disabled')
+
+    async def _step(self, name: str, action, result_key: str = 'rows'):
+        step = self.steps.setdefault(name, {"state": "pending"})
+        step["state"] = "running"
+        start = time.perf_counter()
+        try:
+            result = await action()
+        except Exception as e:
+            logger.warning(f"⚠️  Warm-up step {name} failed: {e}")
+            step.update(state="failed", error=str(e), seconds=round(time.perf_counter() - start, 3))
+            return False
+        step.update({"state": "done", result_key: result, "seconds": round(time.perf_counter() - start, 3),
+                     "completed_at": datetime.now().isoformat()})
+        step.pop("error", None)
+        return True
+
+    def _prefetch(self) -> bool:
+        return self.connector.cache.enabled and bool(self.datasets)
+
+    async def run(self):
+        self.state = 'running'
+        self.started_at = datetime.now().isoformat()
+        for name in ('authenticate', 'connection_pool', *(self.datasets if self._prefetch() else ())):
+            self.steps[name] = {"state": "pending"}
+        logger.info("🔥 Warming up Odoo connection and caches...")
+        connector = self.connector
+        ok = await self._step('authenticate', lambda: connector.run_async(connector.ensure_authenticated), 'uid')
+        ok = ok and await self._step('connection_pool', lambda: connector.run_async(connector.open_connections), 'connections')
+        if ok and self._prefetch():
+            for name, fetch in self.datasets.items():
+                ok = await self._step(name, fetch) and ok
+        self.state = 'ready' if ok else 'degraded'
+        self.completed_at = datetime.now().isoformat()
+        logger.info(f"🔥 Warm-up {self.state}")
+
+        if not self._prefetch() or self.refresh_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def refresh(self):
+        shared = self.connector.shared
+        try:
+            # Los demás workers leen lo que refresque este en la caché compartida
+            if shared is not None and not await self.connector.run_async(shared.acquire, 'warmup:refresh', self.refresh_interval / 2):
+                return
+        except Exception as e:
+            logger.warning(f"⚠️  Shared cache unavailable for warm-up refresh: {e}")
+        token = cache_refresh.set(True)
+        try:
+            for name, fetch in self.datasets.items():
+                await self._step(name, fetch)
+        finally:
+            cache_refresh.reset(token)
+        self.refreshes += 1
+        if all(step["state"] == "done" for step in self.steps.values()):
+            self.state = 'ready'
+        logger.info(f"🔥 Refreshed {len(self.datasets)} prefetched datasets")
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "refresh_interval_seconds": self.refresh_interval,
+            "started_at": self.started_at,
+            "completed_at": self.completed_at,
+            "refreshes": self.refreshes,
+            "steps": self.steps
+        }
+
+_warmup_datasets = [name.strip() for name in os.getenv('ODOO_WARMUP_DATASETS', ','.join(PREFETCH_DATASETS)).split(',') if name.strip()]
+for _name in _warmup_datasets:
+    if _name not in PREFETCH_DATASETS:
+        raise ValueError(f"ODOO_WARMUP_DATASETS entries must be among {', '.join(PREFETCH_DATASETS)}, got {_name!r}")
+
+warmup = WarmUp(
+    odoo,
+    {name: PREFETCH_DATASETS[name] for name in _warmup_datasets},
+    enabled=os.getenv('ODOO_WARMUP', 'true').lower() in ('1', 'true', 'yes'),
+    refresh_interval=float(os.getenv('ODOO_WARMUP_REFRESH', '0'))
+)
+
+@app.on_event("startup")
+async def start_warmup():
+    if warmup.enabled:
+        app.state.warmup_task = asyncio.create_task(warmup.run())
 
 # ==================== ENDPOINTS ====================
 
@@ -107,6 +2115,10 @@ async def root():
         "endpoints": {
             "health": "GET /health - Check server health and Odoo connection",
             "tools": "GET /tools - List all available tools",
+            "metrics": "GET /metrics - Prometheus metrics (Odoo calls, cache, request latency)",
+            "cache_stats": "GET /cache/stats - Odoo query cache statistics",
+            "cache_flush": "POST /cache/flush - Flush the Odoo query cache (all or one model)",
+            "sync_stats": "GET /sync/stats - Local replica sync status",
             "sales": "POST /get_sales_data - Get sales orders with filters",
             "customers": "POST /get_customer_insights - Customer segmentation (RFM analysis) with geographic data",
             "opportunities": "POST /get_crm_opportunities - CRM pipeline data",
@@ -121,25 +2133,64 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
-    try:
-        if not odoo.uid:
-            odoo.authenticate()
-        return {
-            "status": "healthy",
-            "odoo_connected": True,
-            "odoo_uid": odoo.uid,
-            "odoo_url": odoo.url,
-            "odoo_db": odoo.db,
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "odoo_connected": False,
-            "error": str(e),
-            "timestamp": datetime.now().isoformat()
-        }
+    """
+    Health check (liveness), estado de la sesión y del cortocircuito de Odoo y progreso de la
+    precarga ("ready" / "warmup"). No llama a Odoo: responde al instante aunque Odoo esté lento
+    o el pool de llamadas ocupado.
+    """
+    session = odoo.session
+    if odoo.breaker.state != 'closed':
+        # El servicio sigue vivo pero Odoo no responde
+        status = "degraded"
+    elif session.last_error and not session.valid:
+        # La última autenticación falló y no hay sesión con la que trabajar
+        status = "unhealthy"
+    else:
+        status = "healthy"
+    return {
+        "status": status,
+        "odoo_connected": session.valid and odoo.breaker.state == 'closed',
+        "odoo_uid": odoo.uid,
+        "session": session.stats(),
+        "odoo_url": odoo.url,
+        "odoo_db": odoo.db,
+        "connection_pool": odoo.pool.stats(),
+        "circuit_breaker": odoo.breaker.stats(),
+        "request_coalescing": single_flight.stats(),
+        "worker_pid": os.getpid(),
+        "shared_cache": odoo.shared.backend if odoo.shared is not None else None,
+        "ready": warmup.ready,
+        "warmup": warmup.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/sync/stats")
+async def sync_stats():
+    """Estado de la réplica local de pedidos, líneas y clientes"""
+    if odoo.replica is None:
+        return {"enabled": False}
+    return odoo.replica.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Estadísticas de la caché de consultas a Odoo"""
+    return odoo.cache.stats()
+
+@app.post("/cache/flush")
+async def cache_flush(request: CacheFlushRequest):
+    """Vacía la caché de consultas a Odoo, entera o solo la de un modelo"""
+    removed = odoo.cache.invalidate(request.model)
+    logger.info(f"🧹 Cache flushed ({request.model or 'all models'}) - {removed} entries removed")
+    return {
+        "success": True,
+        "model": request.model,
+        "removed_entries": removed
+    }
 
 @app.get("/tools")
 async def list_tools():
@@ -149,53 +2200,55 @@ async def list_tools():
             {
                 "name": "get_sales_data",
                 "description": "Obtiene datos de ventas con filtros opcionales",
-                "parameters": ["days_back", "state", "partner_ids", "min_amount"]
+                "parameters": ["days_back", "state", "partner_ids", "min_amount", "fields"]
             },
             {
                 "name": "get_customer_insights",
                 "description": "Analiza comportamiento y segmentación de clientes (RFM) con datos geográficos completos (state_id, city, zip, etc.)",
-                "parameters": ["segment", "min_purchases", "min_revenue"]
+                "parameters": ["segment", "min_purchases", "min_revenue", "fields"]
             },
             {
                 "name": "get_crm_opportunities",
                 "description": "Obtiene oportunidades del pipeline de ventas",
-                "parameters": ["stage", "min_probability", "days_inactive"]
+                "parameters": ["stage", "min_probability", "days_inactive", "fields"]
             },
             {
                 "name": "get_product_performance",
                 "description": "Analiza rendimiento de productos por ventas",
-                "parameters": ["days_back", "top_n"]
+                "parameters": ["days_back", "top_n", "fields"]
             },
             {
                 "name": "get_sales_team_performance",
                 "description": "Métricas de rendimiento del equipo de ventas",
-                "parameters": ["days_back"]
+                "parameters": ["days_back", "fields"]
             },
             {
                 "name": "search_customers",
                 "description": "Busca clientes por nombre, email o teléfono con datos geográficos completos (state_id, city, zip, street, vat, etc.)",
-                "parameters": ["query", "limit"]
+                "parameters": ["query", "limit", "fields"]
             },
             {
                 "name": "get_territorial_analysis",
                 "description": "Análisis territorial EXHAUSTIVO v1.2.0: clientes, ventas, productos y vendedores por provincia/ciudad. NUEVAS FUNCIONALIDADES: segmentación RFM territorial, análisis MoM (comparación con período anterior), métricas de concentración, y oportunidades de expansión.",
-                "parameters": ["days_back"]
+                "parameters": ["days_back", "fields"]
             },
             {
                 "name": "get_category_analysis",
                 "description": "Análisis exhaustivo por categoría de cliente (CADENA HOTEL, CADENA RESTAURANTE, HELADERIA, etc.). Incluye: ventas por categoría, segmentación RFM, top clientes, distribución geográfica, y productos más vendidos por tipo de negocio.",
-                "parameters": ["category_id", "days_back", "top_customers"]
+                "parameters": ["category_id", "days_back", "top_customers", "fields"]
             },
             {
                 "name": "get_comprehensive_data",
-                "description": "Obtiene todos los datos necesarios para análisis completo",
-                "parameters": ["days_back"]
+                "description": "Obtiene todos los datos necesarios para análisis completo (o solo las secciones indicadas en sections: sales, customers, opportunities, products, team, territorial, categories; fields se aplica a los registros de sales)",
+                "parameters": ["days_back", "sections", "fields"]
             }
         ]
     }
 
 @app.post("/get_sales_data")
-async def get_sales_data(request: SalesDataRequest):
+@traced
+@coalesced
+async def get_sales_data(request: SalesDataRequest, http_request: Request = None):
     """Obtiene datos de ventas de Odoo con filtros opcionales"""
     try:
         date_from = (datetime.now() - timedelta(days=request.days_back)).strftime('%Y-%m-%d')
@@ -209,109 +2262,126 @@ async def get_sales_data(request: SalesDataRequest):
         if request.min_amount:
             filters.append(['amount_total', '>=', request.min_amount])
 
-        sales = odoo.execute_kw('sale.order', 'search_read', [filters], {
-            'fields': ['name', 'partner_id', 'date_order', 'amount_total',
-                      'state', 'user_id', 'team_id'],
-            'order': 'date_order desc',
-            'limit': 1000
-        })
-
-        # Calcular estadísticas
-        total_revenue = sum(s.get('amount_total', 0) for s in sales)
-        avg_order = total_revenue / len(sales) if sales else 0
+        # El importe se lee siempre: el streaming acumula con él los totales
+        fields = fetch_fields(['name', 'partner_id', 'date_order', 'amount_total', 'state', 'user_id', 'team_id'],
+                              request.fields, required=('amount_total',))
 
-        return {
-            "success": True,
-            "count": len(sales),
-            "data": sales,
-            "summary": {
+        def summary(total_orders, total_revenue):
+            return {
+                "total_orders": total_orders,
                 "total_revenue": round(total_revenue, 2),
-                "avg_order_value": round(avg_order, 2),
+                "avg_order_value": round(total_revenue / total_orders if total_orders else 0, 2),
                 "period_days": request.days_back,
                 "date_from": date_from,
                 "date_to": datetime.now().strftime('%Y-%m-%d')
             }
-        }
+
+        if wants_stream(http_request, request):
+            # Todas las ventas, emitidas según se leen de Odoo; los totales van en la última línea
+            async def lines():
+                total_orders, total_revenue = 0, 0
+                async for sale in odoo.search_read_stream('sale.order', filters, fields, order='date_order desc'):
+                    total_orders += 1
+                    total_revenue += sale.get('amount_total', 0)
+                    yield {"type": "record", "data": project([sale], request.fields)[0]}
+                yield {"type": "summary", "success": True, "count": total_orders, "complete": True,
+                       "summary": summary(total_orders, total_revenue)}
+            return ndjson_response(lines(), "get_sales_data")
+
+        # Los totales se agregan sobre todas las ventas; el detalle se limita a las 1000 más recientes
+        max_rows = 1000
+        totals = await odoo.read_group_async('sale.order', filters, [], {'total_revenue': ('amount_total', 'sum')})
+        total_revenue = totals[0]['total_revenue'] if totals else 0
+        total_orders = totals[0]['__count'] if totals else 0
+        sales = await odoo.execute_kw_async('sale.order', 'search_read', [filters], {
+            'fields': fields,
+            'order': 'date_order desc',
+            'limit': max_rows
+        })
+
+        return json_response(http_request, {
+            "success": True,
+            "count": len(sales),
+            "complete": total_orders == len(sales),
+            "data": project(sales, request.fields),
+            "summary": summary(total_orders, total_revenue)
+        })
     except Exception as e:
         logger.error(f"Error in get_sales_data: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_customer_insights")
-async def get_customer_insights(request: CustomerInsightsRequest):
+@traced
+@coalesced
+async def get_customer_insights(request: CustomerInsightsRequest, http_request: Request = None):
     """Analiza comportamiento y segmentación RFM de clientes - INCLUYE DATOS GEOGRÁFICOS"""
     try:
-        partners = odoo.execute_kw('res.partner', 'search_read',
-            [[['customer_rank', '>', 0]]], {
-            'fields': ['name', 'email', 'phone', 'mobile', 'street', 'street2',
-                      'city', 'state_id', 'zip', 'country_id', 'vat',
-                      'create_date', 'ref'],
-            'limit': 1000
-        })
+        timer = PhaseTimer("get_customer_insights")
+        partners = await odoo.search_read_all('res.partner', [['customer_rank', '>', 0]], fetch_fields(
+            CUSTOMER_PROFILE_FIELDS, request.fields, required=('name', 'create_date')))
+        timer.mark("fetch_partners")
+
+        # Histórico de pedidos confirmados agregado en Odoo por cliente
+        # (una sola consulta en lugar de una por cliente)
+        history_groups = await fetch_order_history(['partner_id.customer_rank', '>', 0])
+        history_by_partner = {g['partner_id'][0]: g for g in history_groups if g.get('partner_id')}
+        timer.mark("read_group_order_history")
+
+        # Segmentación RFM de todos los clientes con compras en un solo cálculo por columnas
+        buyers = [p for p in partners if p['id'] in history_by_partner]
+        histories = [history_by_partner[p['id']] for p in buyers]
+        rfm = rfm_engine.score(
+            [h['total_revenue'] for h in histories],
+            [h['__count'] for h in histories],
+            [rfm_engine.to_epoch_day(h['last_order_date']) for h in histories])
+        timer.mark("rfm_scoring")
 
         insights = []
-        for partner in partners:
-            # Obtener órdenes del cliente
-            orders = odoo.execute_kw('sale.order', 'search_read',
-                [[['partner_id', '=', partner['id']], ['state', 'in', ['sale', 'done']]]], {
-                'fields': ['date_order', 'amount_total']
-            })
-
-            if orders:
-                total_revenue = sum(o['amount_total'] for o in orders)
-                num_purchases = len(orders)
-                last_order_date = max(o['date_order'] for o in orders)
-                days_since_last = (datetime.now() - datetime.strptime(last_order_date[:10], '%Y-%m-%d')).days
-
-                # Segmentación RFM
-                if total_revenue > 10000 and num_purchases > 5:
-                    segment = "vip"
-                elif days_since_last > 180 and num_purchases > 2:
-                    segment = "at_risk"
-                elif num_purchases == 1 and days_since_last < 30:
-                    segment = "new"
-                elif days_since_last > 365:
-                    segment = "inactive"
-                else:
-                    segment = "regular"
-
-                # Filtrar por segmento solicitado
-                if request.segment == "all" or request.segment == segment:
-                    insight = {
-                        'partner_id': partner['id'],
-                        'name': partner['name'],
-                        'email': partner['email'],
-                        'phone': partner['phone'],
-                        'mobile': partner.get('mobile'),
-                        'street': partner.get('street'),
-                        'street2': partner.get('street2'),
-                        'city': partner.get('city'),
-                        'state_id': partner.get('state_id'),
-                        'zip': partner.get('zip'),
-                        'country_id': partner.get('country_id'),
-                        'vat': partner.get('vat'),
-                        'ref': partner.get('ref'),
-                        'total_revenue': round(total_revenue, 2),
-                        'num_purchases': num_purchases,
-                        'avg_order_value': round(total_revenue / num_purchases, 2),
-                        'last_order_date': last_order_date,
-                        'days_since_last': days_since_last,
-                        'segment': segment,
-                        'customer_since': partner['create_date'],
-                        'ltv_score': round(total_revenue * (1 - min(days_since_last / 365, 1)), 2)
-                    }
+        for i, partner in enumerate(buyers):
+            history = histories[i]
+            total_revenue = history['total_revenue']
+            num_purchases = history['__count']
+            segment = rfm['segment'][i]
+
+            # Filtrar por segmento solicitado
+            if request.segment == "all" or request.segment == segment:
+                insight = {
+                    'partner_id': partner['id'],
+                    'name': partner['name'],
+                    'email': partner.get('email'),
+                    'phone': partner.get('phone'),
+                    'mobile': partner.get('mobile'),
+                    'street': partner.get('street'),
+                    'street2': partner.get('street2'),
+                    'city': partner.get('city'),
+                    'state_id': partner.get('state_id'),
+                    'zip': partner.get('zip'),
+                    'country_id': partner.get('country_id'),
+                    'vat': partner.get('vat'),
+                    'ref': partner.get('ref'),
+                    'total_revenue': round(total_revenue, 2),
+                    'num_purchases': num_purchases,
+                    'avg_order_value': round(total_revenue / num_purchases, 2),
+                    'last_order_date': history['last_order_date'],
+                    'days_since_last': rfm['days_since_last'][i],
+                    'segment': segment,
+                    'customer_since': partner['create_date'],
+                    'ltv_score': round(rfm['ltv_score'][i], 2)
+                }
 
-                    # Aplicar filtros adicionales
-                    if request.min_purchases and insight['num_purchases'] < request.min_purchases:
-                        continue
-                    if request.min_revenue and insight['total_revenue'] < request.min_revenue:
-                        continue
+                # Aplicar filtros adicionales
+                if request.min_purchases and insight['num_purchases'] < request.min_purchases:
+                    continue
+                if request.min_revenue and insight['total_revenue'] < request.min_revenue:
+                    continue
 
-                    insights.append(insight)
+                insights.append(insight)
 
         # Ordenar por revenue
         insights.sort(key=lambda x: x['total_revenue'], reverse=True)
+        timer.mark("build_insights")
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(insights),
             "data": insights[:100],  # Limitar a top 100
@@ -326,13 +2396,15 @@ async def get_customer_insights(request: CustomerInsightsRequest):
                 "total_revenue": round(sum(c['total_revenue'] for c in insights), 2),
                 "avg_revenue_per_customer": round(sum(c['total_revenue'] for c in insights) / len(insights), 2) if insights else 0
             }
-        }
+        }, "get_customer_insights")
     except Exception as e:
         logger.error(f"Error in get_customer_insights: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_crm_opportunities")
-async def get_crm_opportunities(request: OpportunitiesRequest):
+@traced
+@coalesced
+async def get_crm_opportunities(request: OpportunitiesRequest, http_request: Request = None):
     """Obtiene y analiza oportunidades del CRM"""
     try:
         filters = []
@@ -345,68 +2417,89 @@ async def get_crm_opportunities(request: OpportunitiesRequest):
             date_limit = (datetime.now() - timedelta(days=request.days_inactive)).strftime('%Y-%m-%d')
             filters.append(['write_date', '<', date_limit])
 
-        opportunities = odoo.execute_kw('crm.lead', 'search_read', [filters], {
-            'fields': ['name', 'partner_id', 'expected_revenue', 'probability',
-                      'stage_id', 'user_id', 'team_id', 'date_deadline',
-                      'create_date', 'write_date'],
-            'order': 'expected_revenue desc',
-            'limit': 500
-        })
+        # Las métricas del pipeline cubren todas las oportunidades; el detalle se limita a las 500
+        # mayores (en modo streaming se emiten todas según se leen de Odoo)
+        max_rows = 500
+        metrics = {'total_opportunities': 0, 'total_pipeline': 0, 'weighted_pipeline': 0, 'total_probability': 0}
+
+        async def opportunities_stream():
+            fields = fetch_fields([
+                'name', 'partner_id', 'expected_revenue', 'probability',
+                'stage_id', 'user_id', 'team_id', 'date_deadline',
+                'create_date', 'write_date'], request.fields, required=('expected_revenue', 'probability'))
+            async for opp in odoo.search_read_stream('crm.lead', filters, fields, order='expected_revenue desc'):
+                metrics['total_opportunities'] += 1
+                metrics['total_pipeline'] += opp.get('expected_revenue', 0) or 0
+                metrics['weighted_pipeline'] += (opp.get('expected_revenue', 0) or 0) * (opp.get('probability', 0) or 0) / 100
+                metrics['total_probability'] += opp.get('probability', 0) or 0
+                yield opp
+
+        def pipeline_metrics():
+            total_opportunities = metrics['total_opportunities']
+            total_pipeline = metrics['total_pipeline']
+            return {
+                "total_opportunities": total_opportunities,
+                "total_pipeline_value": round(total_pipeline, 2),
+                "weighted_pipeline_value": round(metrics['weighted_pipeline'], 2),
+                "avg_deal_size": round(total_pipeline / total_opportunities, 2) if total_opportunities else 0,
+                "avg_probability": round(metrics['total_probability'] / total_opportunities, 2) if total_opportunities else 0
+            }
 
-        # Calcular métricas del pipeline
-        total_pipeline = sum(o.get('expected_revenue', 0) or 0 for o in opportunities)
-        weighted_pipeline = sum(
-            (o.get('expected_revenue', 0) or 0) * (o.get('probability', 0) or 0) / 100
-            for o in opportunities
-        )
+        if wants_stream(http_request, request):
+            async def lines():
+                async for opp in opportunities_stream():
+                    yield {"type": "record", "data": project([opp], request.fields)[0]}
+                yield {"type": "summary", "success": True, "count": metrics['total_opportunities'],
+                       "complete": True, "pipeline_metrics": pipeline_metrics()}
+            return ndjson_response(lines(), "get_crm_opportunities")
 
-        return {
+        opportunities = []
+        async for opp in opportunities_stream():
+            if len(opportunities) < max_rows:
+                opportunities.append(opp)
+
+        return json_response(http_request, {
             "success": True,
             "count": len(opportunities),
-            "data": opportunities,
-            "pipeline_metrics": {
-                "total_opportunities": len(opportunities),
-                "total_pipeline_value": round(total_pipeline, 2),
-                "weighted_pipeline_value": round(weighted_pipeline, 2),
-                "avg_deal_size": round(total_pipeline / len(opportunities), 2) if opportunities else 0,
-                "avg_probability": round(sum(o.get('probability', 0) or 0 for o in opportunities) / len(opportunities), 2) if opportunities else 0
-            }
-        }
+            "complete": metrics['total_opportunities'] == len(opportunities),
+            "data": project(opportunities, request.fields),
+            "pipeline_metrics": pipeline_metrics()
+        })
     except Exception as e:
         logger.error(f"Error in get_crm_opportunities: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_product_performance")
-async def get_product_performance(request: ProductPerformanceRequest):
+@traced
+@coalesced
+async def get_product_performance(request: ProductPerformanceRequest, http_request: Request = None):
     """Analiza rendimiento de productos - VERSIÓN CORREGIDA"""
     try:
         date_from = (datetime.now() - timedelta(days=request.days_back)).strftime('%Y-%m-%d')
 
-        order_lines = odoo.execute_kw('sale.order.line', 'search_read',
-            [[['order_id.date_order', '>=', date_from], ['order_id.state', 'in', ['sale', 'done']]]], {
-            'fields': ['product_id', 'product_uom_qty', 'price_subtotal'],
-            'limit': 5000
-        })
+        # Agregación por producto en Odoo (sin descargar las líneas)
+        product_groups = await odoo.read_group_async('sale.order.line',
+            [['order_id.date_order', '>=', date_from], ['order_id.state', 'in', ['sale', 'done']]],
+            ['product_id'], {
+                'total_qty': ('product_uom_qty', 'sum'),
+                'total_revenue': ('price_subtotal', 'sum')
+            })
 
         product_stats = {}
         skipped_lines = 0
 
-        for line in order_lines:
+        for group in product_groups:
             # FIX: Verificar que product_id no sea False o None
-            if not line.get('product_id') or line['product_id'] is False:
-                skipped_lines += 1
+            if not group.get('product_id'):
+                skipped_lines += group['__count']
                 continue
 
-            prod_id = line['product_id'][0]
-            if prod_id not in product_stats:
-                product_stats[prod_id] = {
-                    'product_name': line['product_id'][1],
-                    'total_qty': 0,
-                    'total_revenue': 0
-                }
-
-            product_stats[prod_id]['total_qty'] += line.get('product_uom_qty', 0)
-            product_stats[prod_id]['total_revenue'] += line.get('price_subtotal', 0)
+            prod_id = group['product_id'][0]
+            product_stats[prod_id] = {
+                'product_name': group['product_id'][1],
+                'total_qty': group['total_qty'],
+                'total_revenue': group['total_revenue']
+            }
 
         if skipped_lines > 0:
             logger.warning(f"Skipped {skipped_lines} order lines without product_id")
@@ -425,7 +2518,7 @@ async def get_product_performance(request: ProductPerformanceRequest):
         # Ordenar por revenue y limitar
         performance.sort(key=lambda x: x['total_revenue'], reverse=True)
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(performance),
             "data": performance[:request.top_n],
@@ -435,34 +2528,32 @@ async def get_product_performance(request: ProductPerformanceRequest):
                 "period_days": request.days_back,
                 "skipped_lines": skipped_lines
             }
-        }
+        }, "get_product_performance")
     except Exception as e:
         logger.error(f"Error in get_product_performance: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_sales_team_performance")
-async def get_sales_team_performance(request: SalesDataRequest):
+@traced
+@coalesced
+async def get_sales_team_performance(request: SalesDataRequest, http_request: Request = None):
     """Analiza rendimiento del equipo de ventas"""
     try:
         date_from = (datetime.now() - timedelta(days=request.days_back)).strftime('%Y-%m-%d')
 
-        sales = odoo.execute_kw('sale.order', 'search_read',
-            [[['date_order', '>=', date_from], ['state', 'in', ['sale', 'done']]]], {
-            'fields': ['user_id', 'amount_total']
-        })
+        # Agregación por vendedor en Odoo
+        user_groups = await odoo.read_group_async('sale.order',
+            [['date_order', '>=', date_from], ['state', 'in', ['sale', 'done']]],
+            ['user_id'], {'total_revenue': ('amount_total', 'sum')})
 
         team_stats = {}
-        for sale in sales:
-            if sale.get('user_id'):
-                user_id = sale['user_id'][0]
-                if user_id not in team_stats:
-                    team_stats[user_id] = {
-                        'user_name': sale['user_id'][1],
-                        'total_revenue': 0,
-                        'num_deals': 0
-                    }
-                team_stats[user_id]['total_revenue'] += sale['amount_total']
-                team_stats[user_id]['num_deals'] += 1
+        for group in user_groups:
+            if group.get('user_id'):
+                team_stats[group['user_id'][0]] = {
+                    'user_name': group['user_id'][1],
+                    'total_revenue': group['total_revenue'],
+                    'num_deals': group['__count']
+                }
 
         # Calcular métricas
         performance = [
@@ -478,7 +2569,7 @@ async def get_sales_team_performance(request: SalesDataRequest):
 
         performance.sort(key=lambda x: x['total_revenue'], reverse=True)
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(performance),
             "data": performance,
@@ -488,13 +2579,15 @@ async def get_sales_team_performance(request: SalesDataRequest):
                 "avg_deal_size": round(sum(p['total_revenue'] for p in performance) / sum(p['num_deals'] for p in performance), 2) if performance else 0,
                 "period_days": request.days_back
             }
-        }
+        }, "get_sales_team_performance")
     except Exception as e:
         logger.error(f"Error in get_sales_team_performance: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/search_customers")
-async def search_customers(request: CustomerSearchRequest):
+@traced
+@coalesced
+async def search_customers(request: CustomerSearchRequest, http_request: Request = None):
     """Busca clientes por nombre, email o teléfono - INCLUYE DATOS GEOGRÁFICOS"""
     try:
         filters = [
@@ -505,26 +2598,28 @@ async def search_customers(request: CustomerSearchRequest):
             ['ref', 'ilike', request.query]
         ]
 
-        customers = odoo.execute_kw('res.partner', 'search_read', [filters], {
-            'fields': ['name', 'email', 'phone', 'mobile', 'street', 'street2',
-                      'city', 'state_id', 'zip', 'country_id', 'vat',
-                      'customer_rank', 'supplier_rank', 'sale_order_count',
-                      'create_date', 'write_date', 'ref', 'comment'],
+        customers = await odoo.execute_kw_async('res.partner', 'search_read', [filters], {
+            'fields': fetch_fields(['name', 'email', 'phone', 'mobile', 'street', 'street2',
+                                    'city', 'state_id', 'zip', 'country_id', 'vat',
+                                    'customer_rank', 'supplier_rank', 'sale_order_count',
+                                    'create_date', 'write_date', 'ref', 'comment'], request.fields),
             'limit': request.limit
         })
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(customers),
             "data": customers,
             "query": request.query
-        }
+        }, "search_customers")
     except Exception as e:
         logger.error(f"Error in search_customers: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_territorial_analysis")
-async def get_territorial_analysis(request: SalesDataRequest):
+@traced
+@coalesced
+async def get_territorial_analysis(request: SalesDataRequest, http_request: Request = None):
     """
     Análisis territorial EXHAUSTIVO: clientes, ventas, productos y vendedores por provincia/ciudad.
 
@@ -538,50 +2633,41 @@ async def get_territorial_analysis(request: SalesDataRequest):
         date_from = (datetime.now() - timedelta(days=request.days_back)).strftime('%Y-%m-%d')
         date_from_previous = (datetime.now() - timedelta(days=request.days_back * 2)).strftime('%Y-%m-%d')
         date_to_previous = (datetime.now() - timedelta(days=request.days_back + 1)).strftime('%Y-%m-%d')
+        timer = PhaseTimer("get_territorial_analysis")
 
         # 1. Obtener todos los clientes con datos geográficos
         logger.info("📍 Fetching customers with geographic data...")
-        customers = odoo.execute_kw('res.partner', 'search_read',
-            [[['customer_rank', '>', 0]]], {
-            'fields': ['id', 'name', 'city', 'state_id', 'country_id'],
-            'limit': 5000
-        })
-
-        # 2. Obtener ventas del período ACTUAL con partner info
-        logger.info(f"📊 Fetching sales from {date_from}...")
-        sales = odoo.execute_kw('sale.order', 'search_read',
-            [[['date_order', '>=', date_from], ['state', 'in', ['sale', 'done']]]], {
-            'fields': ['partner_id', 'amount_total', 'user_id', 'date_order'],
-            'limit': 10000
-        })
-
-        # 2b. Obtener ventas del período ANTERIOR para comparación temporal
-        logger.info(f"📊 Fetching previous period sales ({date_from_previous} to {date_to_previous})...")
-        sales_previous = odoo.execute_kw('sale.order', 'search_read',
-            [[['date_order', '>=', date_from_previous], ['date_order', '<=', date_to_previous], ['state', 'in', ['sale', 'done']]]], {
-            'fields': ['partner_id', 'amount_total'],
-            'limit': 10000
-        })
-
-        # 2c. Obtener TODAS las órdenes de clientes para segmentación RFM
-        logger.info("👥 Fetching all customer orders for RFM segmentation...")
-        all_customer_orders = odoo.execute_kw('sale.order', 'search_read',
-            [[['state', 'in', ['sale', 'done']]]], {
-            'fields': ['partner_id', 'amount_total', 'date_order'],
-            'limit': 20000
-        })
-
-        # 3. Obtener líneas de pedido para análisis de productos por territorio
-        logger.info("🎯 Fetching order lines for product analysis...")
-        order_ids = [s['id'] for s in sales]
-        if order_ids:
-            order_lines = odoo.execute_kw('sale.order.line', 'search_read',
-                [[['order_id', 'in', order_ids]]], {
-                'fields': ['order_id', 'product_id', 'product_uom_qty', 'price_subtotal'],
-                'limit': 20000
+        customers = await fetch_geo_customers()
+        timer.mark("fetch_customers")
+
+        # 2. Ventas del período ACTUAL agregadas en Odoo por cliente y vendedor
+        logger.info(f"📊 Aggregating sales from {date_from}...")
+        sales_groups = await odoo.read_group_async('sale.order',
+            [['date_order', '>=', date_from], ['state', 'in', ['sale', 'done']]],
+            ['partner_id', 'user_id'], {'revenue': ('amount_total', 'sum')})
+        timer.mark("read_group_sales")
+
+        # 2b. Ventas del período ANTERIOR por cliente para comparación temporal
+        logger.info(f"📊 Aggregating previous period sales ({date_from_previous} to {date_to_previous})...")
+        previous_groups = await odoo.read_group_async('sale.order',
+            [['date_order', '>=', date_from_previous], ['date_order', '<=', date_to_previous], ['state', 'in', ['sale', 'done']]],
+            ['partner_id'], {'revenue': ('amount_total', 'sum')})
+        timer.mark("read_group_previous_period")
+
+        # 2c. Histórico completo por cliente para segmentación RFM
+        logger.info("👥 Aggregating customer order history for RFM segmentation...")
+        rfm_groups = await fetch_order_history()
+        timer.mark("read_group_rfm_history")
+
+        # 3. Líneas del período agregadas por cliente y producto
+        logger.info("🎯 Aggregating order lines for product analysis...")
+        product_groups = await odoo.read_group_async('sale.order.line',
+            [['order_id.date_order', '>=', date_from], ['order_id.state', 'in', ['sale', 'done']]],
+            ['order_partner_id', 'product_id'], {
+                'qty': ('product_uom_qty', 'sum'),
+                'revenue': ('price_subtotal', 'sum')
             })
-        else:
-            order_lines = []
+        timer.mark("read_group_product_lines")
 
         # 4. Crear mapeo de clientes a ubicación
         customer_location = {}
@@ -597,14 +2683,16 @@ async def get_territorial_analysis(request: SalesDataRequest):
         # 5. Agregar datos por provincia
         territorial_data = {}
 
-        for sale in sales:
-            partner_id = sale['partner_id'][0] if sale.get('partner_id') else None
+        for group in sales_groups:
+            partner_id = group['partner_id'][0] if group.get('partner_id') else None
             if not partner_id or partner_id not in customer_location:
                 continue
 
             location = customer_location[partner_id]
             state = location['state']
             city = location['city']
+            revenue = group['revenue']
+            num_orders = group['__count']
 
             # Inicializar provincia si no existe
             if state not in territorial_data:
@@ -619,8 +2707,8 @@ async def get_territorial_analysis(request: SalesDataRequest):
                 }
 
             # Agregar datos de venta
-            territorial_data[state]['total_revenue'] += sale.get('amount_total', 0)
-            territorial_data[state]['num_orders'] += 1
+            territorial_data[state]['total_revenue'] += revenue
+            territorial_data[state]['num_orders'] += num_orders
             territorial_data[state]['customers'].add(partner_id)
 
             # Agregar datos por ciudad
@@ -630,33 +2718,27 @@ async def get_territorial_analysis(request: SalesDataRequest):
                     'orders': 0,
                     'customers': set()
                 }
-            territorial_data[state]['cities'][city]['revenue'] += sale.get('amount_total', 0)
-            territorial_data[state]['cities'][city]['orders'] += 1
+            territorial_data[state]['cities'][city]['revenue'] += revenue
+            territorial_data[state]['cities'][city]['orders'] += num_orders
             territorial_data[state]['cities'][city]['customers'].add(partner_id)
 
             # Agregar datos de vendedores
-            if sale.get('user_id'):
-                user_name = sale['user_id'][1]
+            if group.get('user_id'):
+                user_name = group['user_id'][1]
                 if user_name not in territorial_data[state]['salespeople']:
                     territorial_data[state]['salespeople'][user_name] = {
                         'revenue': 0,
                         'orders': 0
                     }
-                territorial_data[state]['salespeople'][user_name]['revenue'] += sale.get('amount_total', 0)
-                territorial_data[state]['salespeople'][user_name]['orders'] += 1
+                territorial_data[state]['salespeople'][user_name]['revenue'] += revenue
+                territorial_data[state]['salespeople'][user_name]['orders'] += num_orders
 
         # 6. Agregar productos por territorio
-        order_to_partner = {s['id']: s['partner_id'][0] if s.get('partner_id') else None for s in sales}
-
-        for line in order_lines:
-            if not line.get('product_id'):
-                continue
-
-            order_id = line['order_id'][0] if line.get('order_id') else None
-            if not order_id or order_id not in order_to_partner:
+        for group in product_groups:
+            if not group.get('product_id'):
                 continue
 
-            partner_id = order_to_partner[order_id]
+            partner_id = group['order_partner_id'][0] if group.get('order_partner_id') else None
             if not partner_id or partner_id not in customer_location:
                 continue
 
@@ -664,74 +2746,40 @@ async def get_territorial_analysis(request: SalesDataRequest):
             if state not in territorial_data:
                 continue
 
-            product_name = line['product_id'][1]
+            product_name = group['product_id'][1]
             if product_name not in territorial_data[state]['products']:
                 territorial_data[state]['products'][product_name] = {
                     'qty': 0,
                     'revenue': 0
                 }
 
-            territorial_data[state]['products'][product_name]['qty'] += line.get('product_uom_qty', 0)
-            territorial_data[state]['products'][product_name]['revenue'] += line.get('price_subtotal', 0)
+            territorial_data[state]['products'][product_name]['qty'] += group['qty']
+            territorial_data[state]['products'][product_name]['revenue'] += group['revenue']
+        timer.mark("aggregate_by_state")
 
-        # 7. Calcular segmentación RFM por cliente
+        # 7. Calcular segmentación RFM por cliente con el motor RFM por columnas
         logger.info("🎯 Calculating RFM segmentation...")
-        customer_rfm = {}
-        for order in all_customer_orders:
-            partner_id = order['partner_id'][0] if order.get('partner_id') else None
-            if not partner_id:
-                continue
-
-            if partner_id not in customer_rfm:
-                customer_rfm[partner_id] = {
-                    'total_revenue': 0,
-                    'num_purchases': 0,
-                    'last_order_date': None
-                }
-
-            customer_rfm[partner_id]['total_revenue'] += order.get('amount_total', 0)
-            customer_rfm[partner_id]['num_purchases'] += 1
-            order_date = order.get('date_order', '')
-            if order_date:
-                if not customer_rfm[partner_id]['last_order_date'] or order_date > customer_rfm[partner_id]['last_order_date']:
-                    customer_rfm[partner_id]['last_order_date'] = order_date
-
-        # Asignar segmento RFM a cada cliente
-        for partner_id, metrics in customer_rfm.items():
-            if metrics['last_order_date']:
-                days_since_last = (datetime.now() - datetime.strptime(metrics['last_order_date'][:10], '%Y-%m-%d')).days
-            else:
-                days_since_last = 999
-
-            total_revenue = metrics['total_revenue']
-            num_purchases = metrics['num_purchases']
-
-            # Segmentación RFM
-            if total_revenue > 10000 and num_purchases > 5:
-                segment = "vip"
-            elif days_since_last > 180 and num_purchases > 2:
-                segment = "at_risk"
-            elif num_purchases == 1 and days_since_last < 30:
-                segment = "new"
-            elif days_since_last > 365:
-                segment = "inactive"
-            else:
-                segment = "regular"
-
-            customer_rfm[partner_id]['segment'] = segment
+        rfm_groups = [g for g in rfm_groups if g.get('partner_id')]
+        rfm = rfm_engine.score(
+            [g['total_revenue'] for g in rfm_groups],
+            [g['__count'] for g in rfm_groups],
+            [rfm_engine.to_epoch_day(g['last_order_date']) for g in rfm_groups])
+        customer_segment = {g['partner_id'][0]: segment for g, segment in zip(rfm_groups, rfm['segment'])}
+        timer.mark("rfm_scoring")
 
         # 8. Calcular métricas del período anterior por provincia
         logger.info("📈 Calculating previous period metrics...")
         previous_revenue_by_state = {}
-        for sale in sales_previous:
-            partner_id = sale['partner_id'][0] if sale.get('partner_id') else None
+        for group in previous_groups:
+            partner_id = group['partner_id'][0] if group.get('partner_id') else None
             if not partner_id or partner_id not in customer_location:
                 continue
 
             state = customer_location[partner_id]['state']
             if state not in previous_revenue_by_state:
                 previous_revenue_by_state[state] = 0
-            previous_revenue_by_state[state] += sale.get('amount_total', 0)
+            previous_revenue_by_state[state] += group['revenue']
+        timer.mark("previous_period_by_state")
 
         # 9. Formatear resultados
         results = []
@@ -759,11 +2807,8 @@ async def get_territorial_analysis(request: SalesDataRequest):
             )
 
             # Calcular segmentación RFM por territorio
-            rfm_segments = {'vip': 0, 'at_risk': 0, 'new': 0, 'inactive': 0, 'regular': 0}
-            for customer_id in data['customers']:
-                if customer_id in customer_rfm:
-                    segment = customer_rfm[customer_id].get('segment', 'regular')
-                    rfm_segments[segment] += 1
+            rfm_segments = rfm_engine.segment_counts(
+                customer_segment[customer_id] for customer_id in data['customers'] if customer_id in customer_segment)
 
             # Calcular crecimiento vs período anterior
             current_revenue = data['total_revenue']
@@ -816,7 +2861,7 @@ async def get_territorial_analysis(request: SalesDataRequest):
         total_previous_revenue = sum(previous_revenue_by_state.values())
 
         # Agregar métricas globales de RFM
-        global_rfm = {'vip': 0, 'at_risk': 0, 'new': 0, 'inactive': 0, 'regular': 0}
+        global_rfm = rfm_engine.empty_segment_counts()
         for r in results:
             for segment, count in r['rfm_segmentation'].items():
                 global_rfm[segment] += count
@@ -833,8 +2878,9 @@ async def get_territorial_analysis(request: SalesDataRequest):
         # Top territorios de crecimiento
         growing_states = [r for r in results if r['growth_vs_previous_period']['growth_rate'] > 0]
         growing_states_sorted = sorted(growing_states, key=lambda x: x['growth_vs_previous_period']['growth_rate'], reverse=True)
+        timer.mark("format_results")
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(results),
             "data": results,
@@ -871,13 +2917,15 @@ async def get_territorial_analysis(request: SalesDataRequest):
                     "underserved_territories": len([r for r in results if r['num_customers'] < 5])
                 }
             }
-        }
+        }, "get_territorial_analysis")
     except Exception as e:
         logger.error(f"Error in get_territorial_analysis: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.post("/get_category_analysis")
-async def get_category_analysis(request: CategoryAnalysisRequest):
+@traced
+@coalesced
+async def get_category_analysis(request: CategoryAnalysisRequest, http_request: Request = None):
     """
     Análisis exhaustivo por categoría de cliente (CADENA HOTEL, RESTAURANTE, HELADERIA, etc.)
 
@@ -893,10 +2941,7 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
 
         # 1. Obtener todas las categorías disponibles
         logger.info("🏷️  Fetching customer categories...")
-        categories = odoo.execute_kw('res.partner.category', 'search_read', [[]], {
-            'fields': ['name', 'parent_id', 'color'],
-            'limit': 200
-        })
+        categories = await fetch_customer_categories()
 
         # Filtrar por categoría específica si se solicita
         if request.category_id:
@@ -904,96 +2949,88 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
             if not categories:
                 raise HTTPException(status_code=404, detail=f"Category ID {request.category_id} not found")
 
-        # 2. Para cada categoría, obtener análisis completo
+        category_ids = [c['id'] for c in categories]
+        confirmed = ['state', 'in', ['sale', 'done']]
+
+        timer = PhaseTimer("get_category_analysis")
+
+        # 2. Clientes de todas las categorías en una sola consulta (con su many2many category_id)
+        logger.info(f"👥 Fetching customers of {len(category_ids)} categories...")
+        partners_by_category = {category_id: [] for category_id in category_ids}
+        # Índice por id compartido por todas las categorías (datos geográficos de top clientes)
+        partners_by_id = {}
+        async for partner in fetch_category_customers(category_ids):
+            partners_by_id[partner['id']] = partner
+            for category_id in partner['category_id']:
+                if category_id in partners_by_category:
+                    partners_by_category[category_id].append(partner)
+        timer.mark("fetch_category_customers")
+
+        # 3. Métricas por cliente agregadas en Odoo para la unión de clientes:
+        # histórico completo (RFM), ventas del período y productos del período
+        logger.info("📊 Aggregating sales of category customers...")
+        history_groups = await fetch_order_history(['partner_id.category_id', 'in', category_ids], ['partner_id.customer_rank', '>', 0])
+        period_groups = await odoo.read_group_async('sale.order',
+            [['partner_id.category_id', 'in', category_ids], ['partner_id.customer_rank', '>', 0],
+             ['date_order', '>=', date_from], confirmed],
+            ['partner_id'], {'revenue': ('amount_total', 'sum')})
+        product_groups = await odoo.read_group_async('sale.order.line',
+            [['order_partner_id.category_id', 'in', category_ids], ['order_partner_id.customer_rank', '>', 0],
+             ['order_id.date_order', '>=', date_from], ['order_id.state', 'in', ['sale', 'done']]],
+            ['order_partner_id', 'product_id'], {
+                'qty': ('product_uom_qty', 'sum'),
+                'revenue': ('price_subtotal', 'sum')
+            })
+        timer.mark("read_group_sales")
+
+        history_by_partner = {
+            g['partner_id'][0]: {
+                'total_revenue': g['total_revenue'],
+                'num_purchases': g['__count'],
+                'last_order_date': g['last_order_date'] or None,
+                'partner_name': g['partner_id'][1]
+            }
+            for g in history_groups if g.get('partner_id')
+        }
+        # Segmentación RFM de todos los clientes de una vez; cada categoría solo la consulta
+        rfm = rfm_engine.score(
+            [h['total_revenue'] for h in history_by_partner.values()],
+            [h['num_purchases'] for h in history_by_partner.values()],
+            [rfm_engine.to_epoch_day(h['last_order_date']) for h in history_by_partner.values()])
+        partner_rfm = dict(zip(history_by_partner, zip(rfm['days_since_last'], rfm['segment'])))
+        period_by_partner = {g['partner_id'][0]: g for g in period_groups if g.get('partner_id')}
+        products_by_partner = {}
+        for g in product_groups:
+            if g.get('order_partner_id') and g.get('product_id'):
+                products_by_partner.setdefault(g['order_partner_id'][0], []).append(g)
+        timer.mark("rfm_scoring")
+
+        # 4. Repartir los resultados entre las categorías en memoria
         category_analysis = []
 
         for category in categories:
             category_id = category['id']
             category_name = category['name']
-
-            logger.info(f"📊 Analyzing category: {category_name}")
-
-            # Obtener clientes de esta categoría
-            partners = odoo.execute_kw('res.partner', 'search_read',
-                [[['category_id', 'in', [category_id]], ['customer_rank', '>', 0]]], {
-                'fields': ['id', 'name', 'city', 'state_id', 'country_id'],
-                'limit': 2000
-            })
+            partners = partners_by_category[category_id]
 
             if not partners:
                 # Si no hay clientes en esta categoría, skip
                 continue
 
-            partner_ids = [p['id'] for p in partners]
-
-            # Obtener ventas de estos clientes en el período
-            sales = odoo.execute_kw('sale.order', 'search_read',
-                [[['partner_id', 'in', partner_ids],
-                  ['date_order', '>=', date_from],
-                  ['state', 'in', ['sale', 'done']]]], {
-                'fields': ['partner_id', 'amount_total', 'date_order'],
-                'limit': 10000
-            })
-
-            # Obtener TODAS las ventas históricas para RFM
-            all_sales = odoo.execute_kw('sale.order', 'search_read',
-                [[['partner_id', 'in', partner_ids], ['state', 'in', ['sale', 'done']]]], {
-                'fields': ['partner_id', 'amount_total', 'date_order'],
-                'limit': 20000
-            })
-
-            # Calcular métricas por cliente
-            customer_metrics = {}
-            for sale in all_sales:
-                partner_id = sale['partner_id'][0] if sale.get('partner_id') else None
-                if not partner_id:
-                    continue
-
-                if partner_id not in customer_metrics:
-                    customer_metrics[partner_id] = {
-                        'total_revenue': 0,
-                        'num_purchases': 0,
-                        'last_order_date': None,
-                        'partner_name': sale['partner_id'][1]
-                    }
-
-                customer_metrics[partner_id]['total_revenue'] += sale.get('amount_total', 0)
-                customer_metrics[partner_id]['num_purchases'] += 1
-                order_date = sale.get('date_order', '')
-                if order_date:
-                    if not customer_metrics[partner_id]['last_order_date'] or order_date > customer_metrics[partner_id]['last_order_date']:
-                        customer_metrics[partner_id]['last_order_date'] = order_date
+            customer_metrics = {p['id']: history_by_partner[p['id']] for p in partners if p['id'] in history_by_partner}
 
             # Asignar segmento RFM a cada cliente
-            rfm_segments = {'vip': 0, 'at_risk': 0, 'new': 0, 'inactive': 0, 'regular': 0}
+            rfm_segments = rfm_engine.empty_segment_counts()
             top_customers_list = []
 
             for partner_id, metrics in customer_metrics.items():
-                if metrics['last_order_date']:
-                    days_since_last = (datetime.now() - datetime.strptime(metrics['last_order_date'][:10], '%Y-%m-%d')).days
-                else:
-                    days_since_last = 999
-
+                days_since_last, segment = partner_rfm[partner_id]
                 total_revenue = metrics['total_revenue']
                 num_purchases = metrics['num_purchases']
-
-                # Segmentación RFM
-                if total_revenue > 10000 and num_purchases > 5:
-                    segment = "vip"
-                elif days_since_last > 180 and num_purchases > 2:
-                    segment = "at_risk"
-                elif num_purchases == 1 and days_since_last < 30:
-                    segment = "new"
-                elif days_since_last > 365:
-                    segment = "inactive"
-                else:
-                    segment = "regular"
-
                 rfm_segments[segment] += 1
 
-                # Añadir a lista de top clientes
-                # Buscar datos geográficos del partner
-                partner_info = next((p for p in partners if p['id'] == partner_id), None)
+                # Añadir a lista de top clientes con los datos geográficos del partner
+                partner_info = partners_by_id.get(partner_id)
 
                 top_customers_list.append({
                     'partner_id': partner_id,
@@ -1010,8 +3047,9 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
             top_customers_list.sort(key=lambda x: x['total_revenue'], reverse=True)
 
             # Calcular métricas de ventas del período
-            total_revenue_period = sum(s.get('amount_total', 0) for s in sales)
-            num_orders_period = len(sales)
+            period_sales = [period_by_partner[p['id']] for p in partners if p['id'] in period_by_partner]
+            total_revenue_period = sum(g['revenue'] for g in period_sales)
+            num_orders_period = sum(g['__count'] for g in period_sales)
 
             # Distribución geográfica
             geo_distribution = {}
@@ -1027,43 +3065,29 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
                 reverse=True
             )
 
-            # Obtener productos más vendidos a esta categoría
-            order_ids = [s['id'] for s in sales]
-            if order_ids:
-                order_lines = odoo.execute_kw('sale.order.line', 'search_read',
-                    [[['order_id', 'in', order_ids]]], {
-                    'fields': ['product_id', 'product_uom_qty', 'price_subtotal'],
-                    'limit': 10000
-                })
-
-                product_stats = {}
-                for line in order_lines:
-                    if not line.get('product_id') or line['product_id'] is False:
-                        continue
-
-                    prod_id = line['product_id'][0]
-                    prod_name = line['product_id'][1]
-
+            # Productos más vendidos a esta categoría
+            product_stats = {}
+            for partner in partners:
+                for g in products_by_partner.get(partner['id'], []):
+                    prod_id = g['product_id'][0]
                     if prod_id not in product_stats:
                         product_stats[prod_id] = {
-                            'product_name': prod_name,
+                            'product_name': g['product_id'][1],
                             'total_qty': 0,
                             'total_revenue': 0
                         }
 
-                    product_stats[prod_id]['total_qty'] += line.get('product_uom_qty', 0)
-                    product_stats[prod_id]['total_revenue'] += line.get('price_subtotal', 0)
-
-                top_products = sorted(
-                    [{'product_name': stats['product_name'],
-                      'qty': stats['total_qty'],
-                      'revenue': round(stats['total_revenue'], 2)}
-                     for stats in product_stats.values()],
-                    key=lambda x: x['revenue'],
-                    reverse=True
-                )[:10]
-            else:
-                top_products = []
+                    product_stats[prod_id]['total_qty'] += g['qty']
+                    product_stats[prod_id]['total_revenue'] += g['revenue']
+
+            top_products = sorted(
+                [{'product_name': stats['product_name'],
+                  'qty': stats['total_qty'],
+                  'revenue': round(stats['total_revenue'], 2)}
+                 for stats in product_stats.values()],
+                key=lambda x: x['revenue'],
+                reverse=True
+            )[:10]
 
             # Agregar análisis de esta categoría
             category_analysis.append({
@@ -1088,6 +3112,7 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
 
         # Ordenar categorías por revenue del período
         category_analysis.sort(key=lambda x: x['revenue_period'], reverse=True)
+        timer.mark("analyze_categories")
 
         # Calcular totales globales
         total_customers = sum(c['num_customers'] for c in category_analysis)
@@ -1095,12 +3120,12 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
         total_orders = sum(c['num_orders_period'] for c in category_analysis)
 
         # RFM global
-        global_rfm = {'vip': 0, 'at_risk': 0, 'new': 0, 'inactive': 0, 'regular': 0}
+        global_rfm = rfm_engine.empty_segment_counts()
         for c in category_analysis:
             for segment, count in c['rfm_segmentation'].items():
                 global_rfm[segment] += count
 
-        return {
+        return json_or_ndjson(http_request, request, {
             "success": True,
             "count": len(category_analysis),
             "data": category_analysis,
@@ -1117,82 +3142,151 @@ async def get_category_analysis(request: CategoryAnalysisRequest):
                 "top_category_revenue": category_analysis[0]['revenue_period'] if category_analysis else 0,
                 "global_rfm_segmentation": global_rfm
             }
-        }
+        }, "get_category_analysis")
     except Exception as e:
         logger.error(f"Error in get_category_analysis: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+# Secciones de get_comprehensive_data que se calculan a la vez y tiempo máximo por sección
+COMPREHENSIVE_MAX_CONCURRENCY = int(os.getenv('COMPREHENSIVE_MAX_CONCURRENCY', '4'))
+COMPREHENSIVE_SECTION_TIMEOUT = float(os.getenv('COMPREHENSIVE_SECTION_TIMEOUT', '120'))
+
+async def _run_section(name: str, coro, semaphore: asyncio.Semaphore):
+    """Ejecuta una sección del informe completo devolviendo (nombre, resultado o marcador de error)"""
+    async with semaphore:
+        timer = PhaseTimer("get_comprehensive_data")
+        try:
+            result = await asyncio.wait_for(coro, COMPREHENSIVE_SECTION_TIMEOUT)
+            timer.mark(f"section:{name}")
+            return name, result
+        except asyncio.TimeoutError:
+            error = f"Timed out after {COMPREHENSIVE_SECTION_TIMEOUT:g}s"
+        except HTTPException as e:
+            error = str(e.detail)
+        except Exception as e:
+            error = str(e)
+    logger.error(f"❌ Section '{name}' of comprehensive data failed: {error}")
+    return name, {"success": False, "error": error}
+
+def _section_value(section: dict, *path):
+    """Valor anidado de una sección, o None si la sección falló"""
+    value = section
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def _executive_summary(data: dict):
+    """Resumen ejecutivo del informe completo a partir de sus secciones (las no pedidas cuentan como vacías)"""
+    sales_data = data.get("sales", {})
+    customer_data = data.get("customers", {})
+    opp_data = data.get("opportunities", {})
+    product_data = data.get("products", {})
+    team_data = data.get("team", {})
+    territorial_data = data.get("territorial", {})
+    category_data = data.get("categories", {})
+
+    return {
+        "total_revenue": _section_value(sales_data, "summary", "total_revenue"),
+        "num_sales": _section_value(sales_data, "summary", "total_orders"),
+        "total_customers": _section_value(customer_data, "count"),
+        "vip_customers": _section_value(customer_data, "summary", "segments", "vip"),
+        "at_risk_customers": _section_value(customer_data, "summary", "segments", "at_risk"),
+        "new_customers": _section_value(customer_data, "summary", "segments", "new"),
+        "pipeline_value": _section_value(opp_data, "pipeline_metrics", "weighted_pipeline_value"),
+        "total_opportunities": _section_value(opp_data, "pipeline_metrics", "total_opportunities"),
+        "top_product": product_data["data"][0]["product_name"] if product_data.get("data") else "N/A",
+        "top_product_revenue": product_data["data"][0]["total_revenue"] if product_data.get("data") else 0,
+        "team_size": _section_value(team_data, "count"),
+        "top_seller": team_data["data"][0]["user_name"] if team_data.get("data") else "N/A",
+        "total_states": _section_value(territorial_data, "summary", "total_states"),
+        "top_state": _section_value(territorial_data, "summary", "top_state"),
+        "top_state_revenue": _section_value(territorial_data, "summary", "top_state_revenue"),
+        "total_categories": _section_value(category_data, "summary", "total_categories"),
+        "top_category": _section_value(category_data, "summary", "top_category"),
+        "top_category_revenue": _section_value(category_data, "summary", "top_category_revenue")
+    }
 
 @app.post("/get_comprehensive_data")
-async def get_comprehensive_data(request: SalesDataRequest):
+@traced
+@coalesced
+async def get_comprehensive_data(request: ComprehensiveRequest, http_request: Request = None):
     """
     Endpoint especial que obtiene TODOS los datos necesarios para análisis completo.
     Ideal para que Claude haga análisis profundos con una sola llamada.
+
+    Con `sections` solo se calculan (y se leen de Odoo) las secciones indicadas.
+    En modo streaming (NDJSON) cada sección se emite en cuanto termina como
+    {"type": "section", "name": ..., "data": ...} y el resumen ejecutivo va en la última línea.
     """
     try:
         logger.info(f"📊 Getting comprehensive data for last {request.days_back} days")
 
         # Preparar requests
-        sales_req = SalesDataRequest(days_back=request.days_back)
+        sales_req = SalesDataRequest(days_back=request.days_back, fields=request.fields)
+        period_req = SalesDataRequest(days_back=request.days_back)
         customer_req = CustomerInsightsRequest(segment="all")
         opp_req = OpportunitiesRequest()
         product_req = ProductPerformanceRequest(days_back=request.days_back)
         category_req = CategoryAnalysisRequest(days_back=request.days_back, top_customers=5)
 
-        # Obtener todos los datos
-        sales_data = await get_sales_data(sales_req)
-        customer_data = await get_customer_insights(customer_req)
-        opp_data = await get_crm_opportunities(opp_req)
-        product_data = await get_product_performance(product_req)
-        team_data = await get_sales_team_performance(sales_req)
-        territorial_data = await get_territorial_analysis(sales_req)
-        category_data = await get_category_analysis(category_req)
-
-        return {
-            "success": True,
-            "period_days": request.days_back,
-            "generated_at": datetime.now().isoformat(),
-            "data": {
-                "sales": sales_data,
-                "customers": customer_data,
-                "opportunities": opp_data,
-                "products": product_data,
-                "team": team_data,
-                "territorial": territorial_data,
-                "categories": category_data
-            },
-            "executive_summary": {
-                "total_revenue": sales_data["summary"]["total_revenue"],
-                "num_sales": sales_data["count"],
-                "total_customers": customer_data["count"],
-                "vip_customers": customer_data["summary"]["segments"]["vip"],
-                "at_risk_customers": customer_data["summary"]["segments"]["at_risk"],
-                "new_customers": customer_data["summary"]["segments"]["new"],
-                "pipeline_value": opp_data["pipeline_metrics"]["weighted_pipeline_value"],
-                "total_opportunities": opp_data["count"],
-                "top_product": product_data["data"][0]["product_name"] if product_data["data"] else "N/A",
-                "top_product_revenue": product_data["data"][0]["total_revenue"] if product_data["data"] else 0,
-                "team_size": team_data["count"],
-                "top_seller": team_data["data"][0]["user_name"] if team_data["data"] else "N/A",
-                "total_states": territorial_data["summary"]["total_states"],
-                "top_state": territorial_data["summary"]["top_state"],
-                "top_state_revenue": territorial_data["summary"]["top_state_revenue"],
-                "total_categories": category_data["summary"]["total_categories"],
-                "top_category": category_data["summary"]["top_category"],
-                "top_category_revenue": category_data["summary"]["top_category_revenue"]
+        # Todas las secciones comparten una instantánea: clientes, pedidos confirmados y
+        # líneas del período se leen de Odoo una sola vez para todo el informe
+        request_snapshot.set(comprehensive_snapshot(request.days_back))
+
+        # Todas las secciones se calculan en paralelo; una sección que falla o excede su
+        # tiempo no invalida el informe, se devuelve con un marcador de error
+        semaphore = asyncio.Semaphore(COMPREHENSIVE_MAX_CONCURRENCY)
+        sections = [
+            ("sales", get_sales_data, sales_req),
+            ("customers", get_customer_insights, customer_req),
+            ("opportunities", get_crm_opportunities, opp_req),
+            ("products", get_product_performance, product_req),
+            ("team", get_sales_team_performance, period_req),
+            ("territorial", get_territorial_analysis, period_req),
+            ("categories", get_category_analysis, category_req)
+        ]
+        if request.sections:
+            sections = [section for section in sections if section[0] in request.sections]
+
+        def report_header(data: dict):
+            section_errors = {name: result["error"] for name, result in data.items() if not result.get("success", True)}
+            return {
+                "success": True,
+                "partial": bool(section_errors),
+                "section_errors": section_errors,
+                "period_days": request.days_back,
+                "generated_at": datetime.now().isoformat()
             }
-        }
+
+        if wants_stream(http_request, request):
+            async def lines():
+                data = {}
+                runs = [_run_section(name, endpoint(section_req), semaphore) for name, endpoint, section_req in sections]
+                for finished in asyncio.as_completed(runs):
+                    name, result = await finished
+                    data[name] = result
+                    yield {"type": "section", "name": name, "data": result}
+                yield {"type": "summary", **report_header(data), "executive_summary": _executive_summary(data)}
+            return ndjson_response(lines(), "get_comprehensive_data")
+
+        data = dict(await asyncio.gather(*(
+            _run_section(name, endpoint(section_req), semaphore) for name, endpoint, section_req in sections
+        )))
+
+        return json_response(http_request, {
+            **report_header(data),
+            "data": data,
+            "executive_summary": _executive_summary(data)
+        })
     except Exception as e:
         logger.error(f"Error in get_comprehensive_data: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 if __name__ == "__main__":
     import uvicorn
 
-    # Autenticar al inicio
-    try:
-        odoo.authenticate()
-    except Exception as e:
-        logger.error(f"⚠️  Failed to authenticate on startup: {e}")
-
+    # La autenticación inicial la hace la precarga de arranque (WarmUp) o la primera llamada
     # Iniciar servidor
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
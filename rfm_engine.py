@@ -0,0 +1,115 @@
+# rfm_engine.py - Motor de segmentación RFM compartido por los endpoints de análisis
+"""
+Segmentación RFM (recency, frequency, monetary) sobre columnas.
+
+Los datos entran como arrays paralelos en lugar de una lista de dicts por pedido o cliente,
+y las fechas como días desde epoch (ver `to_epoch_day`). Con NumPy instalado el cálculo es
+vectorizado; sin NumPy se usa un bucle en Python puro con exactamente el mismo resultado.
+
+Reglas de segmentación (en orden de prioridad):
+    vip       facturación > 10.000 y más de 5 compras
+    at_risk   más de 180 días sin comprar y más de 2 compras
+    new       una sola compra hace menos de 30 días
+    inactive  más de 365 días sin comprar
+    regular   resto de clientes
+"""
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+SEGMENTS = ('vip', 'at_risk', 'new', 'inactive', 'regular')
+
+# Días desde la última compra cuando no hay fecha de pedido
+NO_ORDER_DAYS = 999
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Por debajo de este tamaño el coste de crear arrays supera la ganancia de vectorizar
+VECTORIZE_MIN_ROWS = 256
+
+
+def to_epoch_day(value):
+    """Convierte una fecha de Odoo ('YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS') a días desde epoch"""
+    if not value:
+        return None
+    return date.fromisoformat(value[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def today_epoch_day():
+    return date.today().toordinal() - _EPOCH_ORDINAL
+
+
+def empty_segment_counts():
+    return {segment: 0 for segment in SEGMENTS}
+
+
+def score(total_revenue, num_purchases, last_order_day, today=None):
+    """
+    Calcula recency, segmento y ltv_score por cliente.
+
+    Recibe columnas paralelas (facturación total, número de compras y día de la última compra
+    en días desde epoch, o None) y devuelve un dict de columnas: 'days_since_last',
+    'segment' y 'ltv_score' (sin redondear).
+    """
+    today = today_epoch_day() if today is None else today
+    if np is not None and len(total_revenue) >= VECTORIZE_MIN_ROWS:
+        return _score_numpy(total_revenue, num_purchases, last_order_day, today)
+
+    days_since_last, segments, ltv = [], [], []
+    for revenue, purchases, last_day in zip(total_revenue, num_purchases, last_order_day):
+        days = today - last_day if last_day is not None else NO_ORDER_DAYS
+        days_since_last.append(days)
+        segments.append(classify(revenue, purchases, days))
+        ltv.append(revenue * (1 - min(days / 365, 1)))
+    return {'days_since_last': days_since_last, 'segment': segments, 'ltv_score': ltv}
+
+
+def classify(total_revenue, num_purchases, days_since_last):
+    """Segmento RFM de un cliente"""
+    if total_revenue > 10000 and num_purchases > 5:
+        return "vip"
+    if days_since_last > 180 and num_purchases > 2:
+        return "at_risk"
+    if num_purchases == 1 and days_since_last < 30:
+        return "new"
+    if days_since_last > 365:
+        return "inactive"
+    return "regular"
+
+
+def _days_array(days):
+    """Array de días y máscara de valores ausentes (None)"""
+    missing = np.fromiter((d is None for d in days), dtype=bool, count=len(days))
+    values = np.fromiter((0 if d is None else d for d in days), dtype=np.int64, count=len(days))
+    return values, missing
+
+
+def _score_numpy(total_revenue, num_purchases, last_order_day, today):
+    revenue = np.asarray(total_revenue, dtype=np.float64)
+    purchases = np.asarray(num_purchases, dtype=np.int64)
+    last_day, missing = _days_array(last_order_day)
+    days = np.where(missing, NO_ORDER_DAYS, today - last_day)
+
+    segment = np.select(
+        [
+            (revenue > 10000) & (purchases > 5),
+            (days > 180) & (purchases > 2),
+            (purchases == 1) & (days < 30),
+            days > 365,
+        ],
+        ['vip', 'at_risk', 'new', 'inactive'],
+        default='regular'
+    )
+    ltv = revenue * (1 - np.minimum(days / 365, 1))
+    return {'days_since_last': days.tolist(), 'segment': segment.tolist(), 'ltv_score': ltv.tolist()}
+
+
+def segment_counts(segments):
+    """Número de clientes por segmento"""
+    counts = empty_segment_counts()
+    for segment in segments:
+        counts[segment] += 1
+    return counts
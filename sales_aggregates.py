@@ -0,0 +1,269 @@
+# sales_aggregates.py - Agregados materializados de ventas por día
+"""
+Agregados de ventas por día × cliente × producto × vendedor, mantenidos de forma incremental.
+
+Cada pedido suma su importe y una unidad de recuento en el cubo (estado, cliente, vendedor) de
+su día; cada línea suma importe, cantidad y una unidad en el cubo (estado, cliente, vendedor,
+producto) del día de su pedido. Al cambiar o borrarse un registro se resta su contribución
+anterior y se suma la nueva, así que no hace falta recalcular el histórico tras cada
+sincronización.
+
+Cada combinación de dimensiones guarda sus días ordenados con sumas acumuladas, de modo que la
+suma de cualquier rango de fechas es una diferencia de dos acumulados (búsqueda binaria) y no un
+recorrido de los pedidos del período. `read_group` responde con el mismo formato que
+OdooConnector.read_group las consultas de sumas con filtros de fecha, estado, cliente, vendedor
+o producto, y devuelve None para cualquier otra consulta.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+ORDER_DIMENSIONS = ('state', 'partner_id', 'user_id')
+LINE_DIMENSIONS = ('state', 'partner_id', 'user_id', 'product_id')
+
+# Campos de cada modelo que se pueden resolver con los agregados
+MODELS = {
+    'sale.order': {
+        'dimensions': ORDER_DIMENSIONS,
+        'date': 'date_order',
+        'filters': {'state': 'state', 'partner_id': 'partner_id', 'user_id': 'user_id'},
+        'groupby': {'state': 'state', 'partner_id': 'partner_id', 'user_id': 'user_id'},
+        'measures': {'amount_total': 0},
+    },
+    'sale.order.line': {
+        'dimensions': LINE_DIMENSIONS,
+        'date': 'order_id.date_order',
+        'filters': {'order_id.state': 'state', 'order_partner_id': 'partner_id',
+                    'order_id.user_id': 'user_id', 'product_id': 'product_id'},
+        'groupby': {'order_partner_id': 'partner_id', 'product_id': 'product_id'},
+        'measures': {'price_subtotal': 0, 'product_uom_qty': 1},
+    },
+}
+
+
+def _id(value):
+    """Id de un many2one ([id, nombre] o False)"""
+    return value[0] if isinstance(value, list) and value else None
+
+
+def _day(value):
+    # Los registros sin fecha van al cubo '', anterior a cualquier día
+    return value[:10] if value else ''
+
+
+class BucketTable:
+    """Series diarias de medidas por combinación de dimensiones, con sumas acumuladas"""
+
+    def __init__(self, measures: int):
+        # La última medida es el recuento: un cubo con recuento 0 se elimina
+        self.measures = measures
+        self._series = {}  # clave -> {día: [medidas]}
+        self._cumulative = {}  # clave -> (días ordenados, acumulados); se recalcula al cambiar la serie
+
+    def add(self, key: tuple, day: str, values, sign: int = 1):
+        series = self._series.setdefault(key, {})
+        bucket = series.setdefault(day, [0] * self.measures)
+        for i, value in enumerate(values):
+            bucket[i] += sign * value
+        if not bucket[-1]:
+            # Sin registros en el cubo: descartar también el residuo de redondeo de las sumas
+            del series[day]
+            if not series:
+                del self._series[key]
+        self._cumulative.pop(key, None)
+
+    def keys(self):
+        return self._series.keys()
+
+    def range_sum(self, key: tuple, day_from: str = None, day_to: str = None):
+        """Suma de las medidas de la serie entre dos días (incluidos; None = sin límite)"""
+        cumulative = self._cumulative.get(key)
+        if cumulative is None:
+            days = sorted(self._series[key])
+            totals = [0] * self.measures
+            sums = [tuple(totals)]
+            for day in days:
+                totals = [t + v for t, v in zip(totals, self._series[key][day])]
+                sums.append(tuple(totals))
+            cumulative = self._cumulative[key] = (days, sums)
+        days, sums = cumulative
+        lo = 0 if day_from is None else bisect_left(days, day_from)
+        hi = len(days) if day_to is None else bisect_right(days, day_to)
+        if hi <= lo:
+            return None
+        return [a - b for a, b in zip(sums[hi], sums[lo])]
+
+
+class SalesAggregates:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._orders = {}  # id -> (día, estado, cliente, vendedor, importe)
+        self._lines = {}  # id -> (pedido, cliente, producto, cantidad, importe)
+        self._lines_by_order = {}  # pedido -> {ids de línea}
+        self._names = {}  # (dimensión, id) -> nombre para mostrar
+        self.tables = {
+            'sale.order': BucketTable(2),  # importe, recuento
+            'sale.order.line': BucketTable(3),  # importe, cantidad, recuento
+        }
+
+    def apply(self, orders=(), lines=(), removed_orders=(), removed_lines=()):
+        """Aplica registros nuevos o modificados y borrados de pedidos y líneas"""
+        with self._lock:
+            for line_id in removed_lines:
+                self._set_line(line_id, None)
+            for order_id in removed_orders:
+                self._set_order(order_id, None)
+            for order in orders:
+                self._set_order(order['id'], order)
+            for line in lines:
+                self._set_line(line['id'], line)
+
+    def _remember(self, dimension: str, value):
+        if isinstance(value, list) and len(value) == 2:
+            self._names[(dimension, value[0])] = value[1]
+
+    def _line_contribution(self, line_id: int, sign: int):
+        order_id, partner, product, qty, revenue = self._lines[line_id]
+        order = self._orders.get(order_id)
+        if order is None:
+            return  # Pedido aún no replicado: la línea se suma cuando llegue
+        day, state, _, user, _ = order
+        self.tables['sale.order.line'].add((state, partner, user, product), day, (revenue, qty, 1), sign)
+
+    def _order_contribution(self, order_id: int, sign: int):
+        day, state, partner, user, amount = self._orders[order_id]
+        self.tables['sale.order'].add((state, partner, user), day, (amount, 1), sign)
+        # Las líneas heredan día, estado y vendedor del pedido
+        for line_id in self._lines_by_order.get(order_id, ()):
+            self._line_contribution(line_id, sign)
+
+    def _set_order(self, order_id: int, record):
+        if order_id in self._orders:
+            self._order_contribution(order_id, -1)
+            del self._orders[order_id]
+        if record is not None:
+            self._remember('partner_id', record.get('partner_id'))
+            self._remember('user_id', record.get('user_id'))
+            self._orders[order_id] = (
+                _day(record.get('date_order')), record.get('state') or None, _id(record.get('partner_id')),
+                _id(record.get('user_id')), record.get('amount_total') or 0)
+            self._order_contribution(order_id, 1)
+
+    def _set_line(self, line_id: int, record):
+        if line_id in self._lines:
+            self._line_contribution(line_id, -1)
+            order_id = self._lines.pop(line_id)[0]
+            siblings = self._lines_by_order[order_id]
+            siblings.discard(line_id)
+            if not siblings:
+                del self._lines_by_order[order_id]
+        if record is not None:
+            self._remember('partner_id', record.get('order_partner_id'))
+            self._remember('product_id', record.get('product_id'))
+            order_id = _id(record.get('order_id'))
+            self._lines[line_id] = (
+                order_id, _id(record.get('order_partner_id')), _id(record.get('product_id')),
+                record.get('product_uom_qty') or 0, record.get('price_subtotal') or 0)
+            self._lines_by_order.setdefault(order_id, set()).add(line_id)
+            self._line_contribution(line_id, 1)
+
+    @staticmethod
+    def _date_bound(op: str, value):
+        """Convierte una hoja de fecha en (desde, hasta) por días, o None si no encaja en días completos"""
+        if not isinstance(value, str) or len(value) != 10:
+            return None
+        day = date.fromisoformat(value)
+        # Como en Odoo, una fecha comparada con un datetime abarca el día completo
+        if op == '>=':
+            return value, None
+        if op == '>':
+            return (day + timedelta(days=1)).isoformat(), None
+        if op == '<=':
+            return None, value
+        if op == '<':
+            return None, (day - timedelta(days=1)).isoformat()
+        return None
+
+    def _parse_domain(self, spec: dict, domain: list):
+        """(desde, hasta, {índice de dimensión: valores admitidos}) o None si el dominio no encaja"""
+        day_from, day_to, allowed = None, None, {}
+        for leaf in domain:
+            if not isinstance(leaf, (list, tuple)) or len(leaf) != 3:
+                return None
+            field, op, value = leaf
+            if field == spec['date']:
+                bound = self._date_bound(op, value)
+                if bound is None:
+                    return None
+                if bound[0] is not None and (day_from is None or bound[0] > day_from):
+                    day_from = bound[0]
+                if bound[1] is not None and (day_to is None or bound[1] < day_to):
+                    day_to = bound[1]
+                continue
+            dimension = spec['filters'].get(field)
+            if dimension is None or op not in ('=', 'in'):
+                return None
+            values = list(value) if op == 'in' else [value]
+            # En los many2one, False (sin valor) se guarda como None
+            values = {None if v is False else v for v in values}
+            index = spec['dimensions'].index(dimension)
+            allowed[index] = allowed[index] & values if index in allowed else values
+        return day_from, day_to, allowed
+
+    def read_group(self, model: str, domain: list, groupby: list, aggregates: dict):
+        """
+        Responde un read_group de sumas desde los agregados, o devuelve None si la consulta
+        necesita algo que no está materializado (otros campos, operadores o funciones).
+        """
+        spec = MODELS.get(model)
+        if spec is None or not isinstance(domain, list):
+            return None
+        if not all(gb in spec['groupby'] for gb in groupby):
+            return None
+        if not all(func == 'sum' and field in spec['measures'] for field, func in aggregates.values()):
+            return None
+        parsed = self._parse_domain(spec, domain)
+        if parsed is None:
+            return None
+        day_from, day_to, allowed = parsed
+        group_index = [spec['dimensions'].index(spec['groupby'][gb]) for gb in groupby]
+
+        with self._lock:
+            table = self.tables[model]
+            groups = {}
+            for key in table.keys():
+                if any(key[index] not in values for index, values in allowed.items()):
+                    continue
+                sums = table.range_sum(key, day_from, day_to)
+                if not sums or not sums[-1]:
+                    continue
+                group_key = tuple(key[index] for index in group_index)
+                group = groups.get(group_key)
+                if group is None:
+                    group = groups[group_key] = [0] * len(sums)
+                for i, value in enumerate(sums):
+                    group[i] += value
+
+            result = []
+            for group_key, sums in groups.items():
+                row = {}
+                for gb, index, value in zip(groupby, group_index, group_key):
+                    dimension = spec['dimensions'][index]
+                    if dimension == 'state':
+                        row[gb] = value or False
+                    else:
+                        row[gb] = [value, self._names.get((dimension, value), '')] if value is not None else False
+                row['__count'] = sums[-1]
+                for alias, (field, _) in aggregates.items():
+                    row[alias] = sums[spec['measures'][field]]
+                result.append(row)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "orders": len(self._orders),
+                "lines": len(self._lines),
+                "order_series": len(self.tables['sale.order'].keys()),
+                "line_series": len(self.tables['sale.order.line'].keys())
+            }
@@ -0,0 +1,311 @@
+# shared_cache.py - Caché compartida entre procesos (varios workers de uvicorn)
+"""
+Segundo nivel de la caché de consultas a Odoo y estado de sesión compartidos por todos los
+workers. Cada worker mantiene su QueryCache en memoria; por debajo, un backend común guarda los
+resultados ya serializados (JSON), el uid autenticado y los cerrojos que garantizan que, ante un
+fallo de caché simultáneo en varios workers, solo uno de ellos consulte Odoo.
+
+Backends (ODOO_SHARED_CACHE):
+- sqlite:///ruta/fichero.sqlite3  Fichero SQLite (WAL) para workers de la misma máquina
+- redis://host:6379/0            Redis, para workers en varias máquinas (requiere `pip install redis`)
+"""
+import abc
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:  # redis es opcional: solo se necesita con ODOO_SHARED_CACHE=redis://
+    redis = None
+
+
+def digest(key: str) -> str:
+    """Clave de longitud fija para el backend (las claves de QueryCache son JSON arbitrariamente largos)"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class SharedCache(abc.ABC):
+    """
+    Interfaz de los backends: entradas con caducidad etiquetadas por modelo, estado de sesión
+    (valores sin caducidad) y cerrojos con caducidad por nombre.
+    """
+    backend = None
+
+    @abc.abstractmethod
+    def get(self, key: str):
+        """(valor en bytes, caducidad como timestamp) o None si no está o ha caducado"""
+
+    @abc.abstractmethod
+    def set(self, key: str, model: str, value: bytes, ttl: float):
+        pass
+
+    @abc.abstractmethod
+    def invalidate(self, model: str = None) -> int:
+        pass
+
+    @abc.abstractmethod
+    def get_state(self, name: str):
+        pass
+
+    @abc.abstractmethod
+    def set_state(self, name: str, value: str):
+        pass
+
+    @abc.abstractmethod
+    def delete_state(self, name: str):
+        pass
+
+    @abc.abstractmethod
+    def acquire(self, name: str, ttl: float) -> bool:
+        """Toma el cerrojo `name` si está libre (o caducado); caduca solo tras `ttl` segundos"""
+
+    @abc.abstractmethod
+    def renew(self, name: str, ttl: float) -> bool:
+        """Alarga `ttl` segundos desde ahora el cerrojo `name` si sigue siendo de este proceso"""
+
+    @abc.abstractmethod
+    def release(self, name: str):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.backend}
+
+    def close(self):
+        pass
+
+    @contextlib.contextmanager
+    def holding(self, name: str, ttl: float):
+        """
+        Renueva el cerrojo `name` (ya tomado) cada `ttl`/3 segundos mientras dura el bloque: solo
+        caduca si el proceso deja de responder, no porque la tarea tarde más que `ttl`.
+        """
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(ttl / 3):
+                try:
+                    if not self.renew(name, ttl):
+                        return
+                except Exception:
+                    pass  # Backend caído momentáneamente: se vuelve a intentar en la siguiente vuelta
+
+        thread = threading.Thread(target=keep_alive, name=f"lock-{name[:24]}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def once(self, name: str, load, lookup, timeout: float):
+        """
+        Ejecuta `load()` en un único proceso a la vez para `name`. Los demás esperan a que
+        `lookup()` devuelva (True, valor) con lo que dejó el primero. El cerrojo se renueva
+        mientras `load()` se ejecuta y solo caduca `timeout` segundos después de que su proceso
+        deje de responder; si el primero falla, uno de los que esperan toma el relevo.
+        Devuelve (cargado_aquí, valor).
+        """
+        delay = 0.01
+        while True:
+            if self.acquire(name, timeout):
+                try:
+                    # Otro proceso pudo publicar el valor entre la consulta y el cerrojo
+                    found, value = lookup()
+                    if found:
+                        return False, value
+                    with self.holding(name, timeout):
+                        return True, load()
+                finally:
+                    self.release(name)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            found, value = lookup()
+            if found:
+                return False, value
+
+
+class SQLiteSharedCache(SharedCache):
+    """Backend en un fichero SQLite compartido por los procesos de una misma máquina"""
+    backend = "sqlite"
+
+    # Cada cuántas escrituras se borran las entradas caducadas
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    value BLOB NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_model ON cache (model)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS locks (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )""")
+        self._owner = uuid.uuid4().hex
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, model: str, value: bytes, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache (key, model, expires_at, value) VALUES (?, ?, ?, ?)",
+                               (key, model, now + ttl, value))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+    def invalidate(self, model: str = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("DELETE FROM cache").rowcount
+            return self._conn.execute("DELETE FROM cache WHERE model = ?", (model,)).rowcount
+
+    def get_state(self, name: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, name: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)", (name, value))
+
+    def delete_state(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE name = ?", (name,))
+
+    def acquire(self, name: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE serializa la comprobación y la toma del cerrojo entre procesos
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM locks WHERE name = ? AND expires_at < ?", (name, now))
+                acquired = self._conn.execute("INSERT OR IGNORE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                                              (name, self._owner, now + ttl)).rowcount == 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return acquired
+
+    def renew(self, name: str, ttl: float) -> bool:
+        with self._lock:
+            return self._conn.execute("UPDATE locks SET expires_at = ? WHERE name = ? AND owner = ?",
+                                      (time.time() + ttl, name, self._owner)).rowcount == 1
+
+    def release(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, self._owner))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()
+        return {"backend": self.backend, "path": self.path, "entries": entries, "size_bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisSharedCache(SharedCache):
+    """Backend en Redis: las entradas caducan con PX y cada modelo guarda el conjunto de sus claves"""
+    backend = "redis"
+
+    def __init__(self, url: str, prefix: str = "odoo_mcp:"):
+        if redis is None:
+            raise RuntimeError("ODOO_SHARED_CACHE=redis:// requires the redis package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._owner = uuid.uuid4().hex
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}{kind}:{name}"
+
+    def get(self, key: str):
+        with self._client.pipeline() as pipe:
+            value, remaining_ms = pipe.get(self._key('v', key)).pttl(self._key('v', key)).execute()
+        if value is None or remaining_ms < 0:
+            return None
+        return value, time.time() + remaining_ms / 1000
+
+    def set(self, key: str, model: str, value: bytes, ttl: float):
+        with self._client.pipeline() as pipe:
+            pipe.set(self._key('v', key), value, px=max(1, int(ttl * 1000)))
+            pipe.sadd(self._key('m', model), key)
+            pipe.sadd(self._key('models', ''), model)
+            pipe.execute()
+
+    def invalidate(self, model: str = None) -> int:
+        models = [model] if model is not None else [m.decode() for m in self._client.smembers(self._key('models', ''))]
+        removed = 0
+        for name in models:
+            keys = [self._key('v', k.decode()) for k in self._client.smembers(self._key('m', name))]
+            if keys:
+                removed += self._client.delete(*keys)
+            self._client.delete(self._key('m', name))
+        return removed
+
+    def get_state(self, name: str):
+        value = self._client.get(self._key('s', name))
+        return value.decode() if value is not None else None
+
+    def set_state(self, name: str, value: str):
+        self._client.set(self._key('s', name), value)
+
+    def delete_state(self, name: str):
+        self._client.delete(self._key('s', name))
+
+    def acquire(self, name: str, ttl: float) -> bool:
+        return bool(self._client.set(self._key('l', name), self._owner, nx=True, px=max(1, int(ttl * 1000))))
+
+    def renew(self, name: str, ttl: float) -> bool:
+        key = self._key('l', name)
+        if self._client.get(key) != self._owner.encode():
+            return False
+        return bool(self._client.pexpire(key, max(1, int(ttl * 1000))))
+
+    def release(self, name: str):
+        key = self._key('l', name)
+        if self._client.get(key) == self._owner.encode():
+            self._client.delete(key)
+
+    def close(self):
+        self._client.close()
+
+
+def open_shared_cache(url: str) -> SharedCache:
+    """Crea el backend indicado por ODOO_SHARED_CACHE (sqlite:///ruta o redis://...)"""
+    if url.startswith('sqlite://'):
+        path = url[len('sqlite://'):]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SQLiteSharedCache(path)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisSharedCache(url)
+    raise ValueError(f"ODOO_SHARED_CACHE must start with sqlite:// or redis://, got {url!r}")
@@ -0,0 +1,58 @@
+"""
+Reintentos y cortocircuito de las llamadas a Odoo, contra benchmarks/fake_odoo.py.
+
+Uso:
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fake_odoo  # noqa: E402
+
+API_KEY = 'test'
+
+
+class CheckedFakeOdoo(fake_odoo.FakeOdoo):
+    """FakeOdoo que, como Odoo, devuelve False al autenticar con una clave incorrecta"""
+
+    def authenticate(self, db, login, password, context=None):
+        return password == API_KEY and super().authenticate(db, login, password, context)
+
+
+@pytest.fixture(scope='module')
+def api():
+    server = fake_odoo.serve(CheckedFakeOdoo(fake_odoo.make_dataset(partners=50, orders=100, leads=10)))
+    os.environ.update(
+        ODOO_URL=f'http://127.0.0.1:{server.server_address[1]}', ODOO_DB='test', ODOO_USERNAME='test',
+        ODOO_API_KEY=API_KEY, ODOO_CACHE_TTL='0', ODOO_SYNC_INTERVAL='0', ODOO_WARMUP='false',
+        ODOO_SHARED_CACHE='off', ODOO_RETRY_BACKOFF='0.01', ODOO_BREAKER_THRESHOLD='2')
+    import odoo_mcp_api
+    from fastapi.testclient import TestClient
+    yield odoo_mcp_api, TestClient(odoo_mcp_api.app)
+    server.shutdown()
+
+
+def test_rejected_credentials_are_not_retried_nor_open_the_breaker(api):
+    module, client = api
+    session = module.odoo.session
+    session.api_key, session.uid = 'revoked', None
+    retries = module.ODOO_CALL_RETRIES.render()
+    try:
+        for _ in range(module.odoo.breaker.threshold + 1):
+            response = client.post('/search_customers', json={'query': 'Cliente'})
+            assert response.status_code == 500
+            assert 'rejected the credentials' in response.json()['detail']
+        assert module.odoo.breaker.state == 'closed'
+        assert module.odoo.breaker.failures == 0
+        assert module.ODOO_CALL_RETRIES.render() == retries
+        assert client.get('/health').json()['circuit_breaker']['state'] == 'closed'
+    finally:
+        session.api_key, session.uid = API_KEY, None
+
+    assert client.post('/search_customers', json={'query': 'Cliente'}).status_code == 200